@@ -3,14 +3,39 @@ Flask Web Application for Lab Management System
 Main application file with routes and API endpoints
 """
 
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
+from flask import Flask, Response, g, render_template, request, jsonify, redirect, url_for, stream_with_context
+from flask.json.provider import JSONProvider
 from database import Database
 from werkzeug.utils import secure_filename
+import gzip
+import hashlib
 import io
 import os
-from datetime import datetime
+import shutil
+import time
+import uuid
+import orjson
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson for request parsing and jsonify"""
+
+    option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping the str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.option), mimetype='application/json')
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = 'lab-management-secret-key-2026'
 app.config['UPLOAD_FOLDER'] = 'static/fridge_photos'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
@@ -21,20 +46,137 @@ db = Database('lab_management.db')
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Uploaded photos get unique timestamped names and are never overwritten
+PHOTO_CACHE_MAX_AGE = 7 * 24 * 3600
+PHOTO_URL_PREFIX = '/static/fridge_photos/'
+
+FILE_TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+
+
+ALLOWED_PHOTO_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif'})
+
+
+def _validate_photo(file):
+    """Return (lowercased extension, None) for an acceptable photo, or (None, error)"""
+    if file.filename == '':
+        return None, 'No file selected'
+
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    if file_ext not in ALLOWED_PHOTO_EXTENSIONS:
+        return None, 'Invalid file type. Use JPG, PNG, or GIF'
+
+    return file_ext, None
+
+
+def _photo_storage_path(filename):
+    """Return (stored name, file path) for a new photo, sharded into subfolders.
+
+    The stored name includes the shard folder so it can be appended to
+    /static/fridge_photos/ as-is; spreading files keeps each folder small.
+    """
+    shard = hashlib.sha1(filename.encode('utf-8')).hexdigest()[:2]
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], shard), exist_ok=True)
+    stored_name = f'{shard}/{filename}'
+    return stored_name, os.path.join(app.config['UPLOAD_FOLDER'], shard, filename)
+
+
+def _save_upload(file, filepath):
+    """Stream an uploaded file to disk, renaming into place once complete"""
+    tmp_path = f'{filepath}.{uuid.uuid4().hex}.part'
+    # 0o666 filtered by the umask, matching a plain open() so nginx can serve the photo
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            shutil.copyfileobj(file.stream, tmp, length=1024 * 1024)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+@app.after_request
+def cache_photos(response):
+    """Let browsers and proxies cache uploaded photos"""
+    if request.path.startswith(PHOTO_URL_PREFIX) and response.status_code == 200:
+        response.cache_control.public = True
+        response.cache_control.max_age = PHOTO_CACHE_MAX_AGE
+    return response
+
+
+# Responses smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 512
+COMPRESS_MIMETYPES = frozenset({'application/json', 'text/html', 'text/css', 'text/javascript', 'application/javascript'})
+
+
+@app.after_request
+def compress_response(response):
+    """Gzip text responses for clients that accept it"""
+    if response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    # Streamed and file responses are left alone (static files, CSV export)
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers or 'gzip' not in request.accept_encodings):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def request_settings():
+    """Lab settings, loaded at most once per request"""
+    if 'lab_settings' not in g:
+        g.lab_settings = db.get_all_settings()
+    return g.lab_settings
+
 
 @app.context_processor
 def inject_settings():
     """Make settings available to all templates"""
-    settings = db.get_all_settings()
-    return {'lab_settings': settings}
+    return {'lab_settings': request_settings()}
+
+
+# Last rendered HTML per settings-only template: name -> (settings key, html)
+_rendered_pages = {}
+
+
+def render_static_page(template_name):
+    """Render a template whose only dynamic input is the lab settings"""
+    if app.debug:
+        return render_template(template_name)  # Pick up template edits
+
+    settings_key = tuple(sorted(request_settings().items()))
+    cached = _rendered_pages.get(template_name)
+    if cached and cached[0] == settings_key:
+        return cached[1]
+
+    html = render_template(template_name)
+    _rendered_pages[template_name] = (settings_key, html)
+    return html
+
+
+def conditional_json(data, etag):
+    """JSON response carrying an ETag, or 304 if the client already has it"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(data)
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True  # Always revalidate, never serve blind
+    return response
 
 
 @app.route('/')
 def index():
-    """Main page - displays all records and fridge visualization"""
-    records = db.get_all_records()
+    """Main page - records are loaded by the page from /api/records"""
     fridge_configs = db.get_all_fridge_configs()
-    return render_template('index.html', records=records, fridge_configs=fridge_configs)
+    return render_template('index.html', fridge_configs=fridge_configs)
 
 
 @app.route('/api/records', methods=['GET'])
@@ -42,15 +184,15 @@ def get_records():
     """API endpoint to get all records"""
     search_term = request.args.get('search', '')
     filter_temp = request.args.get('temperature', None)
+    limit = request.args.get('limit', None, type=int)
+    offset = request.args.get('offset', 0, type=int)
 
     if search_term:
-        records = db.search_records(search_term, filter_temp)
+        records = db.search_records(search_term, filter_temp, limit=limit, offset=offset)
     else:
-        records = db.get_all_records()
-        if filter_temp:
-            records = [r for r in records if r['storage_temp'] == filter_temp]
+        records = db.get_all_records(temp_filter=filter_temp, limit=limit, offset=offset)
 
-    return jsonify([dict(r) for r in records])
+    return jsonify(records)
 
 
 @app.route('/api/record/<int:record_id>', methods=['GET'])
@@ -58,27 +200,56 @@ def get_record(record_id):
     """API endpoint to get a single record"""
     record = db.get_record_by_id(record_id)
     if record:
-        return jsonify(dict(record))
+        return jsonify(record)
     return jsonify({'error': 'Record not found'}), 404
 
 
-@app.route('/api/record', methods=['POST'])
-def add_record():
-    """API endpoint to add a new record"""
-    data = request.json
+def _make_required_validator(*requirements):
+    """Build a validator for required fields from (field, message) pairs.
 
-    # Validation
+    The returned function returns the message of the first field left empty,
+    or None when every field is present.
+    """
+    def validate(data):
+        for field, message in requirements:
+            if not data.get(field):
+                return message
+        return None
+
+    return validate
+
+
+_validate_antibody = _make_required_validator(('name', 'Antibody name is required'))
+_validate_fridge = _make_required_validator(
+    ('name', 'Fridge name is required'),
+    ('temp_type', 'Temperature type is required')
+)
+
+
+# (storage_temp, storage_section) pairs that don't exist
+INVALID_STORAGE_LOCATIONS = frozenset({('-80C', 'door')})
+
+
+def _validate_record(data):
+    """Return the first validation error for a record payload, or None"""
     if not data.get('drug_name'):
-        return jsonify({'error': 'Drug name is required'}), 400
+        return 'Drug name is required'
 
-    # Validate storage location fridge matches storage temperature
-    storage_section = data.get('storage_section')
-    storage_temp = data.get('storage_temp')
+    # Ensure the storage location is valid for the temperature
+    if (data.get('storage_temp'), data.get('storage_section')) in INVALID_STORAGE_LOCATIONS:
+        return '-80C freezers do not have door storage'
 
-    if storage_section and storage_temp:
-        # Ensure the storage location is valid for the temperature
-        if storage_temp == '-80C' and storage_section == 'door':
-            return jsonify({'error': '-80C freezers do not have door storage'}), 400
+    return None
+
+
+@app.route('/api/record', methods=['POST'])
+def add_record():
+    """API endpoint to add a new record"""
+    data = request.get_json(cache=False)
+
+    error = _validate_record(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         record_id = db.add_record(data)
@@ -90,19 +261,11 @@ def add_record():
 @app.route('/api/record/<int:record_id>', methods=['PUT'])
 def update_record(record_id):
     """API endpoint to update a record"""
-    data = request.json
-
-    # Validation
-    if not data.get('drug_name'):
-        return jsonify({'error': 'Drug name is required'}), 400
-
-    # Validate storage location
-    storage_section = data.get('storage_section')
-    storage_temp = data.get('storage_temp')
+    data = request.get_json(cache=False)
 
-    if storage_section and storage_temp:
-        if storage_temp == '-80C' and storage_section == 'door':
-            return jsonify({'error': '-80C freezers do not have door storage'}), 400
+    error = _validate_record(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         db.update_record(record_id, data)
@@ -129,7 +292,7 @@ def get_fridge_grid(temp_key):
 
     if config:
         return jsonify({
-            'config': dict(config),
+            'config': config,
             'grid_data': grid_data
         })
     return jsonify({'error': 'Configuration not found'}), 404
@@ -138,14 +301,14 @@ def get_fridge_grid(temp_key):
 @app.route('/api/fridge/config', methods=['GET'])
 def get_all_fridge_configs():
     """API endpoint to get all fridge configurations"""
-    configs = db.get_all_fridge_configs()
-    return jsonify([dict(c) for c in configs])
+    configs, etag = db.get_all_fridge_configs_with_etag()
+    return conditional_json(configs, etag)
 
 
 @app.route('/api/fridge/config/<temp_key>', methods=['PUT'])
 def update_fridge_config(temp_key):
     """API endpoint to update fridge configuration"""
-    data = request.json
+    data = request.get_json(cache=False)
 
     body_rows = data.get('body_rows', 3)
     body_cols = data.get('body_columns', 3)
@@ -168,45 +331,36 @@ def update_fridge_config(temp_key):
 def get_location_items(temp_key, section, row, col):
     """API endpoint to get items at a specific storage location"""
     records = db.get_records_by_location(temp_key, section, row, col)
-    return jsonify([dict(r) for r in records])
+    return jsonify(records)
 
 
 @app.route('/calculator/dilution')
 def dilution_calculator():
     """Dilution calculator page"""
-    records = db.get_all_records()
-    # Convert Row objects to dicts for JSON serialization
-    records_list = [dict(r) for r in records]
-    return render_template('dilution_calculator.html', records=records_list)
+    records = db.get_calculator_records()
+    return render_template('dilution_calculator.html', records=records)
 
 
 @app.route('/calculator/actual-concentration')
 def actual_concentration_calculator():
     """Actual concentration calculator page"""
-    records = db.get_all_records()
-    # Convert Row objects to dicts for JSON serialization
-    records_list = [dict(r) for r in records]
-    return render_template('actual_concentration_calculator.html', records=records_list)
+    records = db.get_calculator_records()
+    return render_template('actual_concentration_calculator.html', records=records)
 
 
-def get_unit_conversion_factor(from_unit, to_unit):
-    """Get the conversion factor to convert from one unit to another.
-
-    Returns the factor to multiply by, or None if units are incompatible.
-    """
-    # Define unit families and their base conversions
+# Unit families and their base conversions
+UNIT_FAMILIES = (
     # Molar units (base: M)
-    molar_units = {
+    {
         'M': 1,
         'mM': 1e-3,
         'µM': 1e-6,
         'nM': 1e-9,
         'pM': 1e-12
-    }
-
+    },
     # Mass/volume units (base: g/mL)
     # Note: µg/µL = 1000 µg/mL = 1 mg/mL
-    mass_vol_units = {
+    {
         'g/mL': 1,
         'mg/mL': 1e-3,
         'µg/mL': 1e-6,
@@ -215,76 +369,109 @@ def get_unit_conversion_factor(from_unit, to_unit):
         'mg/µL': 1,        # 1 mg/µL = 1 g/mL
         'µg/µL': 1e-3,     # 1 µg/µL = 1 mg/mL
         'ng/µL': 1e-6      # 1 ng/µL = 1 µg/mL
-    }
-
-    # Dimensionless units (must match exactly)
-    dimensionless_units = {'%', 'X'}
-
+    },
     # Activity units (base: U/mL)
-    activity_units = {
+    {
         'U/mL': 1,
         'IU/mL': 1  # Treat as equivalent for calculation purposes
-    }
+    },
+    # Dimensionless units (must match exactly - can't convert between % and X)
+    {'%': 1},
+    {'X': 1},
+)
+
+# (from_unit, to_unit) -> factor for every convertible pair, built once at import
+UNIT_CONVERSION_FACTORS = {
+    (from_unit, to_unit): from_base / to_base
+    for family in UNIT_FAMILIES
+    for from_unit, from_base in family.items()
+    for to_unit, to_base in family.items()
+}
+
+
+# Component volumes are mL unless given in one of these units
+VOLUME_TO_ML_DIVISORS = {'µL': 1000.0}
+
+
+def get_unit_conversion_factor(from_unit, to_unit):
+    """Get the conversion factor to convert from one unit to another.
 
-    # Check if units are the same
+    Returns the factor to multiply by, or None if units are incompatible.
+    """
+    # Identical units always convert, even if not in a family
     if from_unit == to_unit:
         return 1.0
+    return UNIT_CONVERSION_FACTORS.get((from_unit, to_unit))
 
-    # Check molar units
-    if from_unit in molar_units and to_unit in molar_units:
-        return molar_units[from_unit] / molar_units[to_unit]
 
-    # Check mass/volume units
-    if from_unit in mass_vol_units and to_unit in mass_vol_units:
-        return mass_vol_units[from_unit] / mass_vol_units[to_unit]
+# Calculator inputs outside this range are rejected (prevents overflow/underflow)
+MAX_VALUE = 1e12  # 1 trillion
+MIN_VALUE = 1e-12  # 1 trillionth
 
-    # Check activity units
-    if from_unit in activity_units and to_unit in activity_units:
-        return activity_units[from_unit] / activity_units[to_unit]
 
-    # Check dimensionless units
-    if from_unit in dimensionless_units and to_unit in dimensionless_units:
-        if from_unit == to_unit:
-            return 1.0
-        return None  # Can't convert between % and X
+def _make_number_validator(fields, invalid_message, required_label=str.capitalize, range_subject='Values'):
+    """Build a validator for positive, in-range numeric fields.
 
-    # Units are incompatible
-    return None
+    Error messages are rendered once here; the returned function does a single
+    pass over the payload and returns (values, None) or (None, error).
+    """
+    checks = []
+    for field in fields:
+        label = field.replace('_', ' ')
+        checks.append((field, f'{required_label(label)} is required', f'{label.capitalize()} must be a positive number'))
+    too_large = f'{range_subject} cannot exceed {MAX_VALUE}'
+    too_small = f'{range_subject} cannot be less than {MIN_VALUE}'
+
+    def validate(data):
+        for field, required_message, _ in checks:
+            value = data.get(field)
+            if value is None or value == '':
+                return None, required_message
+
+        try:
+            values = [float(data[field]) for field in fields]
+        except (ValueError, TypeError):
+            return None, invalid_message
+
+        for value, (_, _, positive_message) in zip(values, checks):
+            if value <= 0:
+                return None, positive_message
+
+        if any(value > MAX_VALUE for value in values):
+            return None, too_large
+        if any(value < MIN_VALUE for value in values):
+            return None, too_small
+
+        return values, None
+
+    return validate
+
+
+_validate_dilution = _make_number_validator(
+    ('stock_concentration', 'final_concentration', 'final_volume'),
+    'All concentration and volume values must be valid numbers',
+    required_label=str.title
+)
+_validate_media_volume = _make_number_validator(
+    ('media_volume',),
+    'Media volume must be a valid number',
+    range_subject='Media volume'
+)
+_validate_component = _make_number_validator(
+    ('stock_concentration', 'volume'),
+    'Stock concentration and volume must be valid numbers'
+)
 
 
 @app.route('/api/calculator/dilution', methods=['POST'])
 def calculate_dilution():
     """API endpoint for dilution calculations"""
-    data = request.json
+    data = request.get_json(cache=False)
 
-    # Validate required fields exist
-    required_fields = ['stock_concentration', 'final_concentration', 'final_volume']
-    for field in required_fields:
-        if field not in data or data[field] is None or data[field] == '':
-            return jsonify({'error': f'{field.replace("_", " ").title()} is required'}), 400
-
-    try:
-        stock_conc = float(data['stock_concentration'])
-        final_conc = float(data['final_concentration'])
-        final_volume = float(data['final_volume'])
-    except (ValueError, TypeError):
-        return jsonify({'error': 'All concentration and volume values must be valid numbers'}), 400
-
-    # Validate positive values
-    if stock_conc <= 0:
-        return jsonify({'error': 'Stock concentration must be a positive number'}), 400
-    if final_conc <= 0:
-        return jsonify({'error': 'Final concentration must be a positive number'}), 400
-    if final_volume <= 0:
-        return jsonify({'error': 'Final volume must be a positive number'}), 400
-
-    # Validate reasonable ranges (prevent overflow/underflow)
-    max_value = 1e12  # 1 trillion
-    min_value = 1e-12  # 1 trillionth
-    if stock_conc > max_value or final_conc > max_value or final_volume > max_value:
-        return jsonify({'error': f'Values cannot exceed {max_value}'}), 400
-    if stock_conc < min_value or final_conc < min_value or final_volume < min_value:
-        return jsonify({'error': f'Values cannot be less than {min_value}'}), 400
+    values, error = _validate_dilution(data)
+    if error:
+        return jsonify({'error': error}), 400
+    stock_conc, final_conc, final_volume = values
 
     stock_unit = data.get('stock_unit', 'µM')
     final_unit = data.get('final_unit', 'µM')
@@ -324,68 +511,33 @@ def calculate_dilution():
 @app.route('/api/calculator/actual-concentration', methods=['POST'])
 def calculate_actual_concentration():
     """API endpoint for actual concentration calculations"""
-    data = request.json
+    data = request.get_json(cache=False)
 
-    # Validate media_volume exists
-    if 'media_volume' not in data or data['media_volume'] is None or data['media_volume'] == '':
-        return jsonify({'error': 'Media volume is required'}), 400
-
-    try:
-        media_volume = float(data['media_volume'])
-    except (ValueError, TypeError):
-        return jsonify({'error': 'Media volume must be a valid number'}), 400
-
-    # Validate media_volume is positive
-    if media_volume <= 0:
-        return jsonify({'error': 'Media volume must be a positive number'}), 400
-
-    # Validate reasonable range
-    max_value = 1e12
-    min_value = 1e-12
-    if media_volume > max_value:
-        return jsonify({'error': f'Media volume cannot exceed {max_value}'}), 400
-    if media_volume < min_value:
-        return jsonify({'error': f'Media volume cannot be less than {min_value}'}), 400
+    values, error = _validate_media_volume(data)
+    if error:
+        return jsonify({'error': error}), 400
+    media_volume = values[0]
 
     # Validate components exist and is a list
     components = data.get('components')
     if not components or not isinstance(components, list):
         return jsonify({'error': 'At least one component is required'}), 400
 
-    results = []
+    # Validate every component before doing any math
+    parsed = []
     for idx, comp in enumerate(components, start=1):
-        # Validate required component fields
-        if 'stock_concentration' not in comp or comp['stock_concentration'] is None or comp['stock_concentration'] == '':
-            return jsonify({'error': f'Component {idx}: Stock concentration is required'}), 400
-        if 'volume' not in comp or comp['volume'] is None or comp['volume'] == '':
-            return jsonify({'error': f'Component {idx}: Volume is required'}), 400
-
-        try:
-            stock_conc = float(comp['stock_concentration'])
-            volume = float(comp['volume'])
-        except (ValueError, TypeError):
-            return jsonify({'error': f'Component {idx}: Stock concentration and volume must be valid numbers'}), 400
-
-        # Validate positive values
-        if stock_conc <= 0:
-            return jsonify({'error': f'Component {idx}: Stock concentration must be a positive number'}), 400
-        if volume <= 0:
-            return jsonify({'error': f'Component {idx}: Volume must be a positive number'}), 400
-
-        # Validate reasonable ranges
-        if stock_conc > max_value or volume > max_value:
-            return jsonify({'error': f'Component {idx}: Values cannot exceed {max_value}'}), 400
-        if stock_conc < min_value or volume < min_value:
-            return jsonify({'error': f'Component {idx}: Values cannot be less than {min_value}'}), 400
+        values, error = _validate_component(comp)
+        if error:
+            return jsonify({'error': f'Component {idx}: {error}'}), 400
+        stock_conc, volume = values
+        parsed.append((idx, comp, stock_conc, volume))
 
+    results = []
+    for idx, comp, stock_conc, volume in parsed:
         volume_unit = comp.get('volume_unit', 'mL')
 
         # Convert volume to mL
-        if volume_unit == 'µL':
-            volume_ml = volume / 1000.0
-        else:
-            volume_ml = volume
-
+        volume_ml = volume / VOLUME_TO_ML_DIVISORS.get(volume_unit, 1)
         final_volume = media_volume + volume_ml
 
         # C2 = (C1 * V1) / V2
@@ -408,23 +560,21 @@ def calculate_actual_concentration():
     })
 
 
+def _file_timestamp():
+    """Format the current local time for use in generated filenames"""
+    return time.strftime(FILE_TIMESTAMP_FORMAT)
+
+
 @app.route('/export/csv')
 def export_csv():
     """Export all records to CSV"""
-    csv_data = db.export_to_csv()
-
-    output = io.BytesIO()
-    output.write(csv_data.encode('utf-8'))
-    output.seek(0)
-
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    timestamp = _file_timestamp()
     filename = f'lab_inventory_{timestamp}.csv'
 
-    return send_file(
-        output,
+    return Response(
+        stream_with_context(db.iter_records_as_csv()),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name=filename
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
 
@@ -443,14 +593,12 @@ def import_csv():
         return jsonify({'error': 'File must be a CSV'}), 400
 
     try:
-        # Read file content
-        csv_content = file.read().decode('utf-8')
-
         # Get skip_duplicates option
         skip_duplicates = request.form.get('skip_duplicates', 'true').lower() == 'true'
 
-        # Import data
-        results = db.import_from_csv(csv_content, skip_duplicates)
+        # Decode and import the upload row by row rather than reading it whole
+        csv_file = io.TextIOWrapper(file.stream, encoding='utf-8', newline='')
+        results = db.import_from_csv_stream(csv_file, skip_duplicates)
 
         return jsonify({
             'success': True,
@@ -466,7 +614,7 @@ def import_csv():
 @app.route('/import-export')
 def import_export_page():
     """Import/Export page"""
-    return render_template('import_export.html')
+    return render_static_page('import_export.html')
 
 
 # ========== VISUAL FRIDGE LAYOUT ROUTES ==========
@@ -474,7 +622,7 @@ def import_export_page():
 @app.route('/visual-fridge-display')
 def visual_fridge_display():
     """Visual fridge display page - view and interact with photo-based layouts"""
-    return render_template('visual_fridge_display.html')
+    return render_static_page('visual_fridge_display.html')
 
 
 @app.route('/api/layout/upload', methods=['POST'])
@@ -490,23 +638,17 @@ def upload_layout_photo():
     if not temp_key or not section:
         return jsonify({'error': 'Temperature and section are required'}), 400
 
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-
-    allowed_extensions = {'.jpg', '.jpeg', '.png', '.gif'}
-    file_ext = os.path.splitext(file.filename)[1].lower()
-
-    if file_ext not in allowed_extensions:
-        return jsonify({'error': 'Invalid file type. Use JPG, PNG, or GIF'}), 400
+    file_ext, error = _validate_photo(file)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         # Generate unique filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = secure_filename(f'{temp_key}_{section}_{timestamp}{file_ext}')
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        timestamp = _file_timestamp()
+        filename, filepath = _photo_storage_path(secure_filename(f'{temp_key}_{section}_{timestamp}{file_ext}'))
 
         # Save file
-        file.save(filepath)
+        _save_upload(file, filepath)
 
         # Create or update layout in database
         layout_id = db.create_or_update_layout(temp_key, section, filename)
@@ -526,7 +668,7 @@ def get_layout_regions(layout_id):
     """Get all regions for a layout"""
     try:
         regions = db.get_regions_for_layout(layout_id)
-        return jsonify([dict(r) for r in regions])
+        return jsonify(regions)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -534,7 +676,7 @@ def get_layout_regions(layout_id):
 @app.route('/api/layout/<int:layout_id>/region', methods=['POST'])
 def create_region(layout_id):
     """Create a new region on a layout"""
-    data = request.json
+    data = request.get_json(cache=False)
 
     required = ['region_name', 'x', 'y', 'width', 'height']
     if not all(field in data for field in required):
@@ -557,7 +699,7 @@ def create_region(layout_id):
 @app.route('/api/region/<int:region_id>', methods=['PUT'])
 def update_region(region_id):
     """Update a region"""
-    data = request.json
+    data = request.get_json(cache=False)
 
     required = ['region_name', 'x', 'y', 'width', 'height']
     if not all(field in data for field in required):
@@ -592,7 +734,7 @@ def get_region_items(region_id):
     """Get all items in a region"""
     try:
         items = db.get_items_in_region(region_id)
-        return jsonify([dict(item) for item in items])
+        return jsonify(items)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -600,7 +742,7 @@ def get_region_items(region_id):
 @app.route('/api/region/<int:region_id>/assign', methods=['POST'])
 def assign_to_region(region_id):
     """Assign an item to a region"""
-    data = request.json
+    data = request.get_json(cache=False)
     drug_id = data.get('drug_id')
 
     if not drug_id:
@@ -617,17 +759,15 @@ def assign_to_region(region_id):
 def get_layout_by_temp_section(temp_key, section):
     """Get layout and regions for a specific temp/section"""
     try:
-        layout = db.get_layout(temp_key, section)
-        if not layout:
+        bundle = db.get_layout_bundle(temp_key, section)
+        if not bundle:
             return jsonify({'error': 'Layout not found'}), 404
 
-        regions = db.get_regions_for_layout(layout['id'])
-        occupancy = db.get_region_occupancy(layout['id'])
-
+        layout, regions, occupancy = bundle
         return jsonify({
-            'layout': dict(layout),
-            'regions': [dict(r) for r in regions],
-            'occupancy': [dict(o) for o in occupancy]
+            'layout': layout,
+            'regions': regions,
+            'occupancy': occupancy
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -638,24 +778,22 @@ def get_layout_by_temp_section(temp_key, section):
 @app.route('/schematic-layout-builder')
 def schematic_layout_builder():
     """Schematic fridge layout builder page"""
-    return render_template('schematic_layout_builder.html')
+    return render_static_page('schematic_layout_builder.html')
 
 
 @app.route('/api/schematic/<temp_key>/<section>', methods=['GET'])
 def get_schematic_layout(temp_key, section):
     """Get schematic layout and zones for a specific temp/section (legacy, no fridge_id)"""
     try:
-        layout = db.get_schematic_layout(temp_key, section)
-        if not layout:
+        bundle = db.get_schematic_bundle(temp_key, section)
+        if not bundle:
             return jsonify({'layout': None, 'zones': [], 'occupancy': []})
 
-        zones = db.get_schematic_zones(layout['id'])
-        occupancy = db.get_zone_occupancy(layout['id'])
-
+        layout, zones, occupancy = bundle
         return jsonify({
-            'layout': dict(layout),
-            'zones': [dict(z) for z in zones],
-            'occupancy': [dict(o) for o in occupancy]
+            'layout': layout,
+            'zones': zones,
+            'occupancy': occupancy
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -665,17 +803,15 @@ def get_schematic_layout(temp_key, section):
 def get_schematic_layout_by_fridge(fridge_id, section):
     """Get schematic layout and zones for a specific fridge and section"""
     try:
-        layout = db.get_schematic_layout_by_fridge(fridge_id, section)
-        if not layout:
+        bundle = db.get_schematic_bundle(None, section, fridge_id=fridge_id)
+        if not bundle:
             return jsonify({'layout': None, 'zones': [], 'occupancy': []})
 
-        zones = db.get_schematic_zones(layout['id'])
-        occupancy = db.get_zone_occupancy(layout['id'])
-
+        layout, zones, occupancy = bundle
         return jsonify({
-            'layout': dict(layout),
-            'zones': [dict(z) for z in zones],
-            'occupancy': [dict(o) for o in occupancy]
+            'layout': layout,
+            'zones': zones,
+            'occupancy': occupancy
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -684,7 +820,7 @@ def get_schematic_layout_by_fridge(fridge_id, section):
 @app.route('/api/schematic/create', methods=['POST'])
 def create_schematic_layout():
     """Create a new schematic layout"""
-    data = request.json
+    data = request.get_json(cache=False)
     temp_key = data.get('temp_key')
     section = data.get('section')
     layout_name = data.get('layout_name')
@@ -703,24 +839,11 @@ def create_schematic_layout():
 @app.route('/api/schematic/<int:layout_id>/zones', methods=['POST'])
 def save_schematic_zones(layout_id):
     """Save all zones for a schematic layout (replaces existing)"""
-    data = request.json
+    data = request.get_json(cache=False)
     zones = data.get('zones', [])
 
     try:
-        # Clear existing zones
-        db.clear_schematic_zones(layout_id)
-
-        # Add new zones
-        for zone in zones:
-            db.add_schematic_zone(
-                layout_id,
-                zone['zone_name'],
-                zone['row_index'],
-                zone['col_index'],
-                zone.get('col_span', 1),
-                zone.get('row_span', 1),
-                zone.get('color', '#e3f2fd')
-            )
+        db.replace_schematic_zones(layout_id, zones)
 
         return jsonify({'success': True})
     except Exception as e:
@@ -739,31 +862,17 @@ def upload_schematic_reference():
     if not layout_id:
         return jsonify({'error': 'layout_id is required'}), 400
 
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-
-    allowed_extensions = {'.jpg', '.jpeg', '.png', '.gif'}
-    file_ext = os.path.splitext(file.filename)[1].lower()
-
-    if file_ext not in allowed_extensions:
-        return jsonify({'error': 'Invalid file type'}), 400
+    file_ext, error = _validate_photo(file)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = secure_filename(f'ref_{layout_id}_{timestamp}{file_ext}')
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        timestamp = _file_timestamp()
+        filename, filepath = _photo_storage_path(secure_filename(f'ref_{layout_id}_{timestamp}{file_ext}'))
+        _save_upload(file, filepath)
 
         # Update layout with reference photo
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE fridge_schematic_layouts
-            SET reference_photo = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (filename, layout_id))
-        conn.commit()
-        conn.close()
+        db.set_schematic_reference_photo(layout_id, filename)
 
         return jsonify({'success': True, 'filename': filename})
     except Exception as e:
@@ -775,22 +884,31 @@ def get_schematic_zone_items(zone_id):
     """Get all items in a schematic zone"""
     try:
         items = db.get_items_in_zone(zone_id)
-        return jsonify([dict(item) for item in items])
+        return jsonify(items)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/schematic/zone/<int:zone_id>/assign', methods=['POST'])
 def assign_to_schematic_zone(zone_id):
-    """Assign an item to a schematic zone"""
-    data = request.json
-    drug_id = data.get('drug_id')
+    """Assign an item, or a list of items via drug_ids, to a schematic zone"""
+    data = request.get_json(cache=False)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
 
-    if not drug_id:
+    drug_ids = data.get('drug_ids')
+    if drug_ids is None and data.get('drug_id') is not None:
+        drug_ids = [data['drug_id']]
+
+    if drug_ids is None or drug_ids == []:
         return jsonify({'error': 'drug_id is required'}), 400
+    if not isinstance(drug_ids, list) or not all(
+            isinstance(drug_id, int) and not isinstance(drug_id, bool) and drug_id > 0
+            for drug_id in drug_ids):
+        return jsonify({'error': 'drug_ids must be a list of positive integer ids'}), 400
 
     try:
-        db.assign_item_to_zone(drug_id, zone_id)
+        db.assign_items_to_zone(drug_ids, zone_id)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -801,14 +919,14 @@ def assign_to_schematic_zone(zone_id):
 @app.route('/antibodies')
 def antibodies_page():
     """Antibody management page"""
-    return render_template('antibodies.html')
+    return render_static_page('antibodies.html')
 
 
 @app.route('/api/antibodies/primary', methods=['GET'])
 def get_primary_antibodies():
     """Get all primary antibodies"""
     antibodies = db.get_all_primary_antibodies()
-    return jsonify([dict(ab) for ab in antibodies])
+    return jsonify(antibodies)
 
 
 @app.route('/api/antibodies/primary/<int:ab_id>', methods=['GET'])
@@ -816,16 +934,17 @@ def get_primary_antibody(ab_id):
     """Get a single primary antibody"""
     antibody = db.get_primary_antibody_by_id(ab_id)
     if antibody:
-        return jsonify(dict(antibody))
+        return jsonify(antibody)
     return jsonify({'error': 'Antibody not found'}), 404
 
 
 @app.route('/api/antibodies/primary', methods=['POST'])
 def add_primary_antibody():
     """Add a new primary antibody"""
-    data = request.json
-    if not data.get('name'):
-        return jsonify({'error': 'Antibody name is required'}), 400
+    data = request.get_json(cache=False)
+    error = _validate_antibody(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         ab_id = db.add_primary_antibody(data)
@@ -837,9 +956,10 @@ def add_primary_antibody():
 @app.route('/api/antibodies/primary/<int:ab_id>', methods=['PUT'])
 def update_primary_antibody(ab_id):
     """Update a primary antibody"""
-    data = request.json
-    if not data.get('name'):
-        return jsonify({'error': 'Antibody name is required'}), 400
+    data = request.get_json(cache=False)
+    error = _validate_antibody(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         db.update_primary_antibody(ab_id, data)
@@ -862,7 +982,7 @@ def delete_primary_antibody(ab_id):
 def get_secondary_antibodies():
     """Get all secondary antibodies"""
     antibodies = db.get_all_secondary_antibodies()
-    return jsonify([dict(ab) for ab in antibodies])
+    return jsonify(antibodies)
 
 
 @app.route('/api/antibodies/secondary/<int:ab_id>', methods=['GET'])
@@ -870,16 +990,17 @@ def get_secondary_antibody(ab_id):
     """Get a single secondary antibody"""
     antibody = db.get_secondary_antibody_by_id(ab_id)
     if antibody:
-        return jsonify(dict(antibody))
+        return jsonify(antibody)
     return jsonify({'error': 'Antibody not found'}), 404
 
 
 @app.route('/api/antibodies/secondary', methods=['POST'])
 def add_secondary_antibody():
     """Add a new secondary antibody"""
-    data = request.json
-    if not data.get('name'):
-        return jsonify({'error': 'Antibody name is required'}), 400
+    data = request.get_json(cache=False)
+    error = _validate_antibody(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         ab_id = db.add_secondary_antibody(data)
@@ -891,9 +1012,10 @@ def add_secondary_antibody():
 @app.route('/api/antibodies/secondary/<int:ab_id>', methods=['PUT'])
 def update_secondary_antibody(ab_id):
     """Update a secondary antibody"""
-    data = request.json
-    if not data.get('name'):
-        return jsonify({'error': 'Antibody name is required'}), 400
+    data = request.get_json(cache=False)
+    error = _validate_antibody(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         db.update_secondary_antibody(ab_id, data)
@@ -927,17 +1049,16 @@ def find_matching_secondaries(primary_id):
 @app.route('/api/settings', methods=['GET'])
 def get_settings():
     """Get all settings"""
-    settings = db.get_all_settings()
-    return jsonify(settings)
+    settings, etag = db.get_all_settings_with_etag()
+    return conditional_json(settings, etag)
 
 
 @app.route('/api/settings', methods=['POST'])
 def update_settings():
     """Update settings"""
-    data = request.json
+    data = request.get_json(cache=False)
     try:
-        for key, value in data.items():
-            db.set_setting(key, value)
+        db.set_settings(data)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -956,7 +1077,7 @@ def get_setting(key):
 def get_fridges():
     """Get all user-defined fridges"""
     fridges = db.get_all_fridges()
-    return jsonify([dict(f) for f in fridges])
+    return jsonify(fridges)
 
 
 @app.route('/api/fridges/<int:fridge_id>', methods=['GET'])
@@ -964,18 +1085,17 @@ def get_fridge(fridge_id):
     """Get a single fridge by ID"""
     fridge = db.get_fridge_by_id(fridge_id)
     if fridge:
-        return jsonify(dict(fridge))
+        return jsonify(fridge)
     return jsonify({'error': 'Fridge not found'}), 404
 
 
 @app.route('/api/fridges', methods=['POST'])
 def add_fridge():
     """Add a new fridge"""
-    data = request.json
-    if not data.get('name'):
-        return jsonify({'error': 'Fridge name is required'}), 400
-    if not data.get('temp_type'):
-        return jsonify({'error': 'Temperature type is required'}), 400
+    data = request.get_json(cache=False)
+    error = _validate_fridge(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         fridge_id = db.add_fridge(data)
@@ -987,11 +1107,10 @@ def add_fridge():
 @app.route('/api/fridges/<int:fridge_id>', methods=['PUT'])
 def update_fridge(fridge_id):
     """Update a fridge"""
-    data = request.json
-    if not data.get('name'):
-        return jsonify({'error': 'Fridge name is required'}), 400
-    if not data.get('temp_type'):
-        return jsonify({'error': 'Temperature type is required'}), 400
+    data = request.get_json(cache=False)
+    error = _validate_fridge(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     try:
         db.update_fridge(fridge_id, data)
@@ -1014,7 +1133,7 @@ def delete_fridge(fridge_id):
 def get_fridges_by_temp(temp_type):
     """Get all fridges of a specific temperature type"""
     fridges = db.get_fridges_by_temp_type(temp_type)
-    return jsonify([dict(f) for f in fridges])
+    return jsonify(fridges)
 
 
 if __name__ == '__main__':
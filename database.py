@@ -3,26 +3,379 @@ Database operations module for Lab Management System
 Handles all SQLite database interactions
 """
 
+import csv
+import io
+import itertools
+import operator
 import sqlite3
 import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
 from datetime import datetime
 
+# Idle read connections kept open per Database instance
+READ_POOL_SIZE = 8
+
+# Compiled statements kept per connection by sqlite3, keyed by SQL text.
+# Sized above the number of distinct queries in this module so pooled
+# connections never re-prepare a hot query.
+STATEMENT_CACHE_SIZE = 256
+
+# Seconds a connection waits on a lock held by another process before
+# raising "database is locked"
+BUSY_TIMEOUT = 5.0
+
+# Applied to the writer connection; journal mode is stored in the database file
+WRITER_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',  # WAL lets readers run alongside the writer
+)
+
+# Applied to every new connection
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-64000',
+)
+
+# Stored in the database's user_version once _create_schema has run against it.
+# Bump this whenever _create_schema gains a table, column, index or default row.
+SCHEMA_VERSION = 5
+
+# Seconds that cached reference data (settings, fridge configs) stays valid.
+# Writes through this instance invalidate immediately; the TTL bounds how
+# stale other worker processes sharing the database file can be.
+CACHE_TTL = 30
+
+# Parsed CSV rows sent to the database per executemany call
+IMPORT_BATCH_SIZE = 500
+
+# Rows written per chunk yielded by the streaming CSV export
+EXPORT_BATCH_SIZE = 500
+
+# CSV export header and the drugs columns written under it, in order
+EXPORT_HEADER = (
+    'ID', 'Drug Name', 'Stock Concentration', 'Unit', 'Storage Temperature',
+    'Supplier', 'Preparation Date', 'Notes', 'Solvents', 'Solubility',
+    'Light Sensitive', 'Preparation Time', 'Expiration Time', 'Sterility',
+    'Lot Number', 'Product Number', 'Storage Section', 'Storage Row', 'Storage Column',
+    'Aliquot Volume'
+)
+EXPORT_COLUMNS = (
+    'id', 'drug_name', 'stock_concentration', 'stock_unit', 'storage_temp',
+    'supplier', 'preparation_date', 'notes', 'solvents', 'solubility',
+    'light_sensitive', 'preparation_time', 'expiration_time', 'sterility',
+    'lot_number', 'product_number', 'storage_section', 'storage_row', 'storage_column',
+    'aliquot_volume'
+)
+EXPORT_QUERY = f'SELECT {", ".join(EXPORT_COLUMNS)} FROM drugs ORDER BY id DESC'
+
+# drugs columns filled by a CSV import and the CSV header read into each one;
+# the export layout minus its ID column, so exported files import back unchanged
+IMPORT_COLUMNS = EXPORT_COLUMNS[1:]
+IMPORT_HEADER = EXPORT_HEADER[1:]
+# Converter for each IMPORT_COLUMNS entry (None keeps the text); unparseable numbers import as NULL
+_NUMERIC_IMPORT_COLUMNS = {'stock_concentration': float, 'storage_row': int, 'storage_column': int}
+IMPORT_CONVERTERS = tuple(_NUMERIC_IMPORT_COLUMNS.get(column) for column in IMPORT_COLUMNS)
+# Rows per multi-VALUES INSERT, keeping placeholders under SQLite's 999-variable floor
+IMPORT_ROWS_PER_STATEMENT = 999 // len(IMPORT_COLUMNS)
+_IMPORT_ROW_PLACEHOLDERS = f'({", ".join("?" * len(IMPORT_COLUMNS))})'
+IMPORT_INSERT_SQL = f'INSERT INTO drugs ({", ".join(IMPORT_COLUMNS)}) VALUES {_IMPORT_ROW_PLACEHOLDERS}'
+IMPORT_MULTI_INSERT_SQL = IMPORT_INSERT_SQL + f', {_IMPORT_ROW_PLACEHOLDERS}' * (IMPORT_ROWS_PER_STATEMENT - 1)
+
+# Record fields a payload must supply, then those that may be omitted, in column order
+RECORD_REQUIRED_FIELDS = (
+    'drug_name', 'stock_concentration', 'stock_unit', 'storage_temp',
+    'supplier', 'preparation_date', 'notes', 'solvents', 'solubility',
+    'light_sensitive', 'preparation_time', 'expiration_time', 'sterility',
+    'lot_number', 'product_number'
+)
+RECORD_OPTIONAL_FIELDS = ('storage_section', 'storage_row', 'storage_column', 'fridge_region_id', 'aliquot_volume')
+RECORD_FIELDS = RECORD_REQUIRED_FIELDS + RECORD_OPTIONAL_FIELDS
+
+
+def _insert_sql(table, fields):
+    """Build an INSERT binding one ? per field, in order"""
+    return f'INSERT INTO {table} ({", ".join(fields)}) VALUES ({", ".join("?" * len(fields))})'
+
+
+def _update_sql(table, fields):
+    """Build an UPDATE binding one ? per field, in order, then the row id"""
+    return f'UPDATE {table} SET {", ".join(f"{field} = ?" for field in fields)} WHERE id = ?'
+
+
+INSERT_RECORD_SQL = _insert_sql('drugs', RECORD_FIELDS)
+UPDATE_RECORD_SQL = _update_sql('drugs', RECORD_FIELDS)
+
+# Antibody payload fields, in column order; all are optional in the payload
+PRIMARY_ANTIBODY_FIELDS = (
+    'name', 'target_protein', 'host_species', 'clonality', 'isotype', 'clone_number',
+    'supplier', 'catalog_number', 'lot_number', 'applications', 'fixation_compatibility',
+    'dilution_if', 'dilution_wb', 'dilution_ihc', 'storage_temp', 'stock_concentration',
+    'aliquot_volume', 'validated', 'notes', 'fridge_region_id',
+    'is_conjugated', 'fluorophore', 'fluorophore_excitation', 'fluorophore_emission'
+)
+SECONDARY_ANTIBODY_FIELDS = (
+    'name', 'target_species', 'target_isotype', 'host_species', 'format', 'conjugate',
+    'fluorophore_excitation', 'fluorophore_emission', 'cross_adsorbed',
+    'cross_adsorbed_against', 'supplier', 'catalog_number', 'lot_number',
+    'applications', 'dilution_if', 'dilution_wb', 'dilution_ihc', 'storage_temp',
+    'stock_concentration', 'aliquot_volume', 'notes', 'fridge_region_id'
+)
+INSERT_PRIMARY_ANTIBODY_SQL = _insert_sql('primary_antibodies', PRIMARY_ANTIBODY_FIELDS)
+UPDATE_PRIMARY_ANTIBODY_SQL = _update_sql('primary_antibodies', PRIMARY_ANTIBODY_FIELDS)
+INSERT_SECONDARY_ANTIBODY_SQL = _insert_sql('secondary_antibodies', SECONDARY_ANTIBODY_FIELDS)
+UPDATE_SECONDARY_ANTIBODY_SQL = _update_sql('secondary_antibodies', SECONDARY_ANTIBODY_FIELDS)
+
+# Columns shown by the antibody list cards and zone item lists; detail views
+# fetch the full row by id
+PRIMARY_ANTIBODY_LIST_QUERY = '''
+    SELECT id, name, target_protein, host_species, clonality, isotype, clone_number,
+           supplier, catalog_number, validated, is_conjugated, fluorophore
+    FROM primary_antibodies ORDER BY name
+'''
+SECONDARY_ANTIBODY_LIST_QUERY = '''
+    SELECT id, name, target_species, target_isotype, host_species, format, conjugate,
+           cross_adsorbed, supplier, catalog_number
+    FROM secondary_antibodies ORDER BY name
+'''
+ZONE_ITEMS_QUERY = '''
+    SELECT id, drug_name, stock_concentration, stock_unit, storage_temp, supplier,
+           lot_number, aliquot_volume, preparation_date
+    FROM drugs
+    WHERE fridge_region_id = ?
+    ORDER BY drug_name
+'''
+
+
+def _cache_name(key):
+    """Return the invalidation name of a cache key: the key, or a tuple key's group"""
+    return key[0] if isinstance(key, tuple) else key
+
+
+# Secondary isotypes that bind both heavy and light chains of any isotype
+_BROAD_ISOTYPE_RE = re.compile(r'h\+l|h&l')
+
+_required_record_values = operator.itemgetter(*RECORD_REQUIRED_FIELDS)
+
+
+# Column names of the statement each thread is currently reading
+_column_names = threading.local()
+
+
+def dict_factory(cursor, row):
+    """Row factory returning each row as a dict keyed by column name"""
+    # description is the same object for every row of a statement, so the
+    # names are only rebuilt when a new statement starts returning rows
+    description = cursor.description
+    if getattr(_column_names, 'description', None) is not description:
+        _column_names.description = description
+        _column_names.names = [column[0] for column in description]
+    return dict(zip(_column_names.names, row))
+
+
+def _paginate(query, params, limit, offset):
+    """Append LIMIT/OFFSET to a query when a page was requested"""
+    if limit is None and not offset:
+        return query, params
+    # SQLite needs a LIMIT clause for OFFSET; -1 means no limit
+    return query + ' LIMIT ? OFFSET ?', [*params, -1 if limit is None else limit, offset or 0]
+
+
+def _record_params(data):
+    """Return a record payload's values in RECORD_FIELDS order"""
+    return (*_required_record_values(data), *[data.get(field) for field in RECORD_OPTIONAL_FIELDS])
+
+
+def _parse_import_value(value, convert):
+    """Convert a stripped CSV cell for insertion; blank or unparseable values become None"""
+    if not value:
+        return None
+    if convert is None:
+        return value
+    try:
+        return convert(value)
+    except ValueError:
+        return None
+
+
+def _primary_antibody_params(data):
+    """Return a primary antibody payload's values in PRIMARY_ANTIBODY_FIELDS order"""
+    data = {**data, 'is_conjugated': 1 if data.get('is_conjugated') else 0}
+    return tuple(map(data.get, PRIMARY_ANTIBODY_FIELDS))
+
+
+def _secondary_antibody_params(data):
+    """Return a secondary antibody payload's values in SECONDARY_ANTIBODY_FIELDS order"""
+    return tuple(map(data.get, SECONDARY_ANTIBODY_FIELDS))
+
+
+def _split_occupancy(rows, occupancy_fields):
+    """Split rows carrying an item_count column into (items, occupancy) lists"""
+    items = []
+    occupancy = []
+    for item in rows:
+        entry = {field: item[field] for field in occupancy_fields}
+        entry['item_count'] = item.pop('item_count')
+        items.append(item)
+        occupancy.append(entry)
+    return items, occupancy
+
 
 class Database:
     def __init__(self, db_path='lab_management.db'):
         self.db_path = db_path
+        self._inherited_connections = []
+        self._reset_connections()
         self.init_database()
 
-    def get_connection(self):
-        """Create and return a database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
+    def _reset_connections(self):
+        """Start with an empty connection pool, writer and cache"""
+        self._read_pool = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+        self._write_lock = threading.Lock()
+        self._write_conn = None
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._cache_token = uuid.uuid4().hex[:12]
+        self._cache_versions = itertools.count(1)
+        # Bumped on every invalidation, per key or (name, ...) group
+        self._cache_generations = {}
+
+    def reset_after_fork(self):
+        """Drop connections inherited from a parent process (call in the child).
+
+        SQLite connections must not be used across fork(). They are not closed
+        either, since closing could checkpoint or remove the WAL the parent is
+        still using; the child just keeps them referenced and opens its own.
+        """
+        if self._write_conn is not None:
+            self._inherited_connections.append(self._write_conn)
+        while True:
+            try:
+                self._inherited_connections.append(self._read_pool.get_nowait())
+            except queue.Empty:
+                break
+        self._reset_connections()
+
+    def get_connection(self, read_only=False):
+        """Create and return a new database connection"""
+        if read_only:
+            # Readers cannot write even by mistake, and never take the write lock
+            target = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+        else:
+            target = self.db_path
+        # Connections may be handed between worker greenlets/threads
+        conn = sqlite3.connect(target, uri=read_only, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = dict_factory  # Rows come back as plain, JSON-ready dicts
+        pragmas = CONNECTION_PRAGMAS if read_only else WRITER_PRAGMAS + CONNECTION_PRAGMAS
+        for pragma in pragmas:
+            conn.execute(pragma)
         return conn
 
+    @contextmanager
+    def read_connection(self):
+        """Borrow a pooled connection for read-only queries"""
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            conn = self.get_connection(read_only=True)
+        try:
+            yield conn
+        finally:
+            try:
+                self._read_pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def write_connection(self):
+        """Hold the single writer connection; commits on success, rolls back on error"""
+        with self._write_lock:
+            if self._write_conn is None:
+                self._write_conn = self.get_connection()
+            conn = self._write_conn
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _cached(self, key, loader):
+        """Return a cached value, calling loader() when missing or expired"""
+        return self._cached_with_etag(key, loader)[0]
+
+    def _cached_with_etag(self, key, loader):
+        """Return (value, etag) for a cached value; the etag changes on every reload"""
+        now = time.monotonic()
+        name = _cache_name(key)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            generation = self._cache_generations.get(name, 0)
+        if entry and entry[0] > now:
+            return entry[1], entry[2]
+        value = loader()
+        # Token is unique to this instance/process so etags never collide across workers
+        etag = f'{self._cache_token}-{next(self._cache_versions)}'
+        with self._cache_lock:
+            # A write invalidated the key while loading; don't cache what may be stale
+            if self._cache_generations.get(name, 0) == generation:
+                self._cache[key] = (now + CACHE_TTL, value, etag)
+        return value, etag
+
+    def _invalidate(self, *keys):
+        """Drop cached values so the next read goes to the database"""
+        with self._cache_lock:
+            for key in keys:
+                self._cache.pop(key, None)
+                self._bump_generation(_cache_name(key))
+
+    def _invalidate_group(self, name):
+        """Drop every cached value stored under a (name, ...) key"""
+        with self._cache_lock:
+            for key in [key for key in self._cache if isinstance(key, tuple) and key[0] == name]:
+                del self._cache[key]
+            self._bump_generation(name)
+
+    def _bump_generation(self, name):
+        """Mark in-flight loads of a cache key or group as stale (hold _cache_lock)"""
+        self._cache_generations[name] = self._cache_generations.get(name, 0) + 1
+
+    def close(self):
+        """Close the writer and all pooled read connections"""
+        with self._write_lock:
+            if self._write_conn is not None:
+                # Let SQLite re-analyze any tables whose statistics have drifted
+                self._write_conn.execute('PRAGMA optimize')
+                self._write_conn.close()
+                self._write_conn = None
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+
     def init_database(self):
         """Initialize database with required tables and columns"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            # Schema checks only run on databases not yet at SCHEMA_VERSION
+            if cursor.execute('PRAGMA user_version').fetchone()['user_version'] < SCHEMA_VERSION:
+                self._create_schema(cursor)
+                # Give the planner statistics for the (possibly new) drugs indexes
+                cursor.execute('ANALYZE drugs')
+                cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='drugs_fts'")
+            self._search_index = cursor.fetchone() is not None
+
+    def _create_schema(self, cursor):
+        """Create tables and apply column migrations"""
 
         # Create main drugs table
         cursor.execute('''
@@ -50,7 +403,7 @@ class Database:
         ''')
 
         # Add storage location columns if they don't exist
-        existing_columns = [col[1] for col in cursor.execute("PRAGMA table_info(drugs)").fetchall()]
+        existing_columns = [col['name'] for col in cursor.execute("PRAGMA table_info(drugs)").fetchall()]
         new_columns = [
             ('storage_section', 'TEXT'),
             ('storage_row', 'INTEGER'),
@@ -63,6 +416,19 @@ class Database:
             if col_name not in existing_columns:
                 cursor.execute(f'ALTER TABLE drugs ADD COLUMN {col_name} {col_type}')
 
+        # Location lookups and grid counts seek on the full storage location
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_drugs_location
+            ON drugs(storage_temp, storage_section, storage_row, storage_column)
+        ''')
+        # Temperature-filtered listings: entries are kept in (storage_temp, id) order,
+        # so ORDER BY id DESC walks the index backwards instead of sorting
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_drugs_storage_temp ON drugs(storage_temp)')
+        # Region/zone item lookups and the occupancy joins match on fridge_region_id
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_drugs_fridge_region ON drugs(fridge_region_id)')
+
+        self._create_search_index(cursor)
+
         # Create fridge layouts table (stores photos)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS fridge_layouts (
@@ -97,7 +463,7 @@ class Database:
         if cursor.fetchone():
             # Check if we need to migrate (old table has UNIQUE on temp_key, section)
             cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='fridge_schematic_layouts'")
-            create_sql = cursor.fetchone()[0]
+            create_sql = cursor.fetchone()['sql']
             if 'UNIQUE(temp_key, section)' in create_sql or 'fridge_id' not in create_sql:
                 # Need to migrate - recreate table with correct schema
                 cursor.execute('ALTER TABLE fridge_schematic_layouts RENAME TO fridge_schematic_layouts_old')
@@ -156,6 +522,14 @@ class Database:
             )
         ''')
 
+        # Regions and zones are always read per layout, including in the occupancy joins;
+        # zones come back in grid order, which the index also provides
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fridge_regions_layout ON fridge_regions(layout_id)')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_schematic_zones_position
+            ON fridge_schematic_zones(layout_id, row_index, col_index)
+        ''')
+
         # Create fridge configuration table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS fridge_config (
@@ -174,11 +548,10 @@ class Database:
             ('-80C', 3, 3, 0, 0)  # -80C has no door storage
         ]
 
-        for temp_key, body_rows, body_cols, door_rows, door_cols in default_configs:
-            cursor.execute('''
-                INSERT OR IGNORE INTO fridge_config (temp_key, body_rows, body_columns, door_rows, door_columns)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (temp_key, body_rows, body_cols, door_rows, door_cols))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO fridge_config (temp_key, body_rows, body_columns, door_rows, door_columns)
+            VALUES (?, ?, ?, ?, ?)
+        ''', default_configs)
 
         # Create settings table for lab configuration
         cursor.execute('''
@@ -189,12 +562,8 @@ class Database:
         ''')
 
         # Initialize default settings
-        cursor.execute('''
-            INSERT OR IGNORE INTO settings (key, value) VALUES ('lab_name', '')
-        ''')
-        cursor.execute('''
-            INSERT OR IGNORE INTO settings (key, value) VALUES ('pi_name', '')
-        ''')
+        cursor.executemany('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)',
+                           [('lab_name', ''), ('pi_name', '')])
 
         # Create fridges table for user-defined fridges
         cursor.execute('''
@@ -209,18 +578,17 @@ class Database:
         ''')
 
         # Initialize default fridges if none exist
-        cursor.execute('SELECT COUNT(*) FROM fridges')
-        if cursor.fetchone()[0] == 0:
+        cursor.execute('SELECT COUNT(*) AS count FROM fridges')
+        if cursor.fetchone()['count'] == 0:
             default_fridges = [
                 ('4°C Fridge', '4C', 'Main Lab', 1),
                 ('-20°C Freezer', '-20C', 'Main Lab', 1),
                 ('-80°C Freezer', '-80C', 'Main Lab', 0)
             ]
-            for name, temp_type, location, has_door in default_fridges:
-                cursor.execute('''
-                    INSERT INTO fridges (name, temp_type, location, has_door)
-                    VALUES (?, ?, ?, ?)
-                ''', (name, temp_type, location, has_door))
+            cursor.executemany('''
+                INSERT INTO fridges (name, temp_type, location, has_door)
+                VALUES (?, ?, ?, ?)
+            ''', default_fridges)
 
         # Create primary antibodies table
         cursor.execute('''
@@ -256,7 +624,7 @@ class Database:
 
         # Migration: Add conjugation columns to primary_antibodies if missing
         cursor.execute("PRAGMA table_info(primary_antibodies)")
-        columns = [col[1] for col in cursor.fetchall()]
+        columns = [col['name'] for col in cursor.fetchall()]
         if 'is_conjugated' not in columns:
             cursor.execute('ALTER TABLE primary_antibodies ADD COLUMN is_conjugated INTEGER DEFAULT 0')
         if 'fluorophore' not in columns:
@@ -295,267 +663,247 @@ class Database:
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        # Matches secondaries by the LOWER(target_species) = LOWER(?) predicate
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_secondary_antibodies_target_species
+            ON secondary_antibodies(LOWER(target_species))
+        ''')
+
+    def get_all_records(self, temp_filter=None, limit=None, offset=0):
+        """Retrieve records newest first, optionally filtered by temperature and paginated"""
+        query = 'SELECT * FROM drugs'
+        params = []
 
-        conn.commit()
-        conn.close()
+        if temp_filter:
+            query += ' WHERE storage_temp = ?'
+            params.append(temp_filter)
 
-    def get_all_records(self):
-        """Retrieve all records from the database"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM drugs ORDER BY id DESC')
-        records = cursor.fetchall()
-        conn.close()
+        query += ' ORDER BY id DESC'
+        query, params = _paginate(query, params, limit, offset)
+
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            records = cursor.fetchall()
+        return records
+
+    def get_calculator_records(self):
+        """Get the id, name and stock concentration of every record for the calculators"""
+        return self._cached('calculator_records', self._load_calculator_records)
+
+    def _load_calculator_records(self):
+        """Query the calculator projection of all records, bypassing the cache"""
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, drug_name, stock_concentration, stock_unit FROM drugs ORDER BY id DESC')
+            records = cursor.fetchall()
         return records
 
     def get_record_by_id(self, record_id):
         """Retrieve a single record by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM drugs WHERE id = ?', (record_id,))
-        record = cursor.fetchone()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM drugs WHERE id = ?', (record_id,))
+            record = cursor.fetchone()
         return record
 
     def add_record(self, data):
         """Add a new record to the database"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO drugs (
-                drug_name, stock_concentration, stock_unit, storage_temp,
-                supplier, preparation_date, notes, solvents, solubility,
-                light_sensitive, preparation_time, expiration_time, sterility,
-                lot_number, product_number, storage_section, storage_row, storage_column,
-                fridge_region_id, aliquot_volume
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['drug_name'],
-            data['stock_concentration'],
-            data['stock_unit'],
-            data['storage_temp'],
-            data['supplier'],
-            data['preparation_date'],
-            data['notes'],
-            data['solvents'],
-            data['solubility'],
-            data['light_sensitive'],
-            data['preparation_time'],
-            data['expiration_time'],
-            data['sterility'],
-            data['lot_number'],
-            data['product_number'],
-            data.get('storage_section'),
-            data.get('storage_row'),
-            data.get('storage_column'),
-            data.get('fridge_region_id'),
-            data.get('aliquot_volume')
-        ))
-
-        record_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_RECORD_SQL, _record_params(data))
+            record_id = cursor.lastrowid
+        self._invalidate('calculator_records')
         return record_id
 
     def update_record(self, record_id, data):
         """Update an existing record"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE drugs SET
-                drug_name = ?,
-                stock_concentration = ?,
-                stock_unit = ?,
-                storage_temp = ?,
-                supplier = ?,
-                preparation_date = ?,
-                notes = ?,
-                solvents = ?,
-                solubility = ?,
-                light_sensitive = ?,
-                preparation_time = ?,
-                expiration_time = ?,
-                sterility = ?,
-                lot_number = ?,
-                product_number = ?,
-                storage_section = ?,
-                storage_row = ?,
-                storage_column = ?,
-                fridge_region_id = ?,
-                aliquot_volume = ?
-            WHERE id = ?
-        ''', (
-            data['drug_name'],
-            data['stock_concentration'],
-            data['stock_unit'],
-            data['storage_temp'],
-            data['supplier'],
-            data['preparation_date'],
-            data['notes'],
-            data['solvents'],
-            data['solubility'],
-            data['light_sensitive'],
-            data['preparation_time'],
-            data['expiration_time'],
-            data['sterility'],
-            data['lot_number'],
-            data['product_number'],
-            data.get('storage_section'),
-            data.get('storage_row'),
-            data.get('storage_column'),
-            data.get('fridge_region_id'),
-            data.get('aliquot_volume'),
-            record_id
-        ))
-
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            conn.execute(UPDATE_RECORD_SQL, (*_record_params(data), record_id))
+        self._invalidate('calculator_records')
 
     def delete_record(self, record_id):
         """Delete a record from the database"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM drugs WHERE id = ?', (record_id,))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM drugs WHERE id = ?', (record_id,))
 
-    def search_records(self, search_term, filter_temp=None):
-        """Search records by name or other fields"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        self._invalidate('calculator_records')
 
-        query = '''
-            SELECT * FROM drugs
-            WHERE (drug_name LIKE ? OR supplier LIKE ? OR notes LIKE ?)
-        '''
-        params = [f'%{search_term}%', f'%{search_term}%', f'%{search_term}%']
+    def _create_search_index(self, cursor):
+        """Create the trigram full-text index over drug_name, supplier and notes.
 
-        if filter_temp:
-            query += ' AND storage_temp = ?'
-            params.append(filter_temp)
+        Skipped when this SQLite build lacks FTS5 or the trigram tokenizer
+        (3.34+), in which case searches fall back to LIKE scans.
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='drugs_fts'")
+        exists = cursor.fetchone() is not None
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS drugs_fts USING fts5(
+                    drug_name, supplier, notes,
+                    content='drugs', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return
 
-        query += ' ORDER BY id DESC'
+        # Keep the index in step with the drugs table
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS drugs_fts_insert AFTER INSERT ON drugs BEGIN
+                INSERT INTO drugs_fts(rowid, drug_name, supplier, notes)
+                VALUES (new.id, new.drug_name, new.supplier, new.notes);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS drugs_fts_delete AFTER DELETE ON drugs BEGIN
+                INSERT INTO drugs_fts(drugs_fts, rowid, drug_name, supplier, notes)
+                VALUES ('delete', old.id, old.drug_name, old.supplier, old.notes);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS drugs_fts_update AFTER UPDATE OF drug_name, supplier, notes ON drugs BEGIN
+                INSERT INTO drugs_fts(drugs_fts, rowid, drug_name, supplier, notes)
+                VALUES ('delete', old.id, old.drug_name, old.supplier, old.notes);
+                INSERT INTO drugs_fts(rowid, drug_name, supplier, notes)
+                VALUES (new.id, new.drug_name, new.supplier, new.notes);
+            END
+        ''')
 
-        cursor.execute(query, params)
-        records = cursor.fetchall()
-        conn.close()
+        # Index records that predate the full-text table
+        if not exists:
+            cursor.execute("INSERT INTO drugs_fts(drugs_fts) VALUES ('rebuild')")
+
+    def search_records(self, search_term, filter_temp=None, limit=None, offset=0):
+        """Search records by name or other fields"""
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+
+            # Trigrams need at least three characters; shorter terms scan with LIKE
+            if self._search_index and len(search_term) >= 3:
+                query = '''
+                    SELECT * FROM drugs
+                    WHERE id IN (SELECT rowid FROM drugs_fts WHERE drugs_fts MATCH ?)
+                '''
+                params = ['"' + search_term.replace('"', '""') + '"']
+            else:
+                # ?1 binds the one pattern to all three columns; later plain ? continue from ?2
+                query = '''
+                    SELECT * FROM drugs
+                    WHERE (drug_name LIKE ?1 OR supplier LIKE ?1 OR notes LIKE ?1)
+                '''
+                params = [f'%{search_term}%']
+
+            if filter_temp:
+                query += ' AND storage_temp = ?'
+                params.append(filter_temp)
+
+            query += ' ORDER BY id DESC'
+            query, params = _paginate(query, params, limit, offset)
+
+            cursor.execute(query, params)
+            records = cursor.fetchall()
         return records
 
     def get_records_by_location(self, temp_key, section, row, col):
         """Get all records at a specific storage location"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT * FROM drugs
-            WHERE storage_temp = ?
-            AND storage_section = ?
-            AND storage_row = ?
-            AND storage_column = ?
-        ''', (temp_key, section, row, col))
-
-        records = cursor.fetchall()
-        conn.close()
+            cursor.execute('''
+                SELECT * FROM drugs
+                WHERE storage_temp = ?
+                AND storage_section = ?
+                AND storage_row = ?
+                AND storage_column = ?
+            ''', (temp_key, section, row, col))
+
+            records = cursor.fetchall()
         return records
 
     def get_fridge_config(self, temp_key):
         """Get fridge configuration for a specific temperature"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridge_config WHERE temp_key = ?', (temp_key,))
-        config = cursor.fetchone()
-        conn.close()
-        return config
+        # Served from the cached list of all configs; there are only a handful
+        return next((config for config in self.get_all_fridge_configs() if config['temp_key'] == temp_key), None)
 
     def get_all_fridge_configs(self):
         """Get all fridge configurations"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridge_config ORDER BY temp_key')
-        configs = cursor.fetchall()
-        conn.close()
+        return self._cached('fridge_configs', self._load_fridge_configs)
+
+    def get_all_fridge_configs_with_etag(self):
+        """Get all fridge configurations with an etag identifying this version"""
+        return self._cached_with_etag('fridge_configs', self._load_fridge_configs)
+
+    def _load_fridge_configs(self):
+        """Query all fridge configurations, bypassing the cache"""
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fridge_config ORDER BY temp_key')
+            configs = cursor.fetchall()
         return configs
 
     def update_fridge_config(self, temp_key, body_rows, body_cols, door_rows, door_cols):
         """Update fridge configuration"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE fridge_config
-            SET body_rows = ?, body_columns = ?, door_rows = ?, door_columns = ?
-            WHERE temp_key = ?
-        ''', (body_rows, body_cols, door_rows, door_cols, temp_key))
+            cursor.execute('''
+                UPDATE fridge_config
+                SET body_rows = ?, body_columns = ?, door_rows = ?, door_columns = ?
+                WHERE temp_key = ?
+            ''', (body_rows, body_cols, door_rows, door_cols, temp_key))
 
-        conn.commit()
-        conn.close()
+        self._invalidate('fridge_configs')
 
     def get_storage_grid_data(self, temp_key):
         """Get grid data for a specific fridge including item counts per cell"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # (key, count) tuples go straight into dict()
+
+            # Count items per cell, answered from idx_drugs_location alone;
+            # SQLite builds the "section-row-column" keys
+            cursor.execute('''
+                SELECT storage_section || '-' || storage_row || '-' || storage_column, COUNT(*)
+                FROM drugs
+                WHERE storage_temp = ?
+                AND storage_section IS NOT NULL
+                AND storage_row IS NOT NULL
+                AND storage_column IS NOT NULL
+                GROUP BY storage_section, storage_row, storage_column
+            ''', (temp_key,))
+            grid_data = dict(cursor)
 
-        # Get all records for this temperature
-        cursor.execute('''
-            SELECT storage_section, storage_row, storage_column, COUNT(*) as count
-            FROM drugs
-            WHERE storage_temp = ?
-            AND storage_section IS NOT NULL
-            AND storage_row IS NOT NULL
-            AND storage_column IS NOT NULL
-            GROUP BY storage_section, storage_row, storage_column
-        ''', (temp_key,))
-
-        grid_data = {}
-        for row in cursor.fetchall():
-            key = f"{row['storage_section']}-{row['storage_row']}-{row['storage_column']}"
-            grid_data[key] = row['count']
-
-        conn.close()
         return grid_data
 
+    def iter_records_as_csv(self):
+        """Yield the CSV export in chunks of EXPORT_BATCH_SIZE rows, straight from the cursor"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+
+        def flush():
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return line
+
+        writer.writerow(EXPORT_HEADER)
+        yield flush()
+
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # Plain tuples, already in EXPORT_COLUMNS order
+            cursor.execute(EXPORT_QUERY)
+            while True:
+                records = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not records:
+                    break
+                writer.writerows(['' if value is None else value for value in record] for record in records)
+                yield flush()
+
     def export_to_csv(self):
         """Export all records to CSV format"""
-        records = self.get_all_records()
-
-        csv_lines = []
-        # Header
-        csv_lines.append(','.join([
-            'ID', 'Drug Name', 'Stock Concentration', 'Unit', 'Storage Temperature',
-            'Supplier', 'Preparation Date', 'Notes', 'Solvents', 'Solubility',
-            'Light Sensitive', 'Preparation Time', 'Expiration Time', 'Sterility',
-            'Lot Number', 'Product Number', 'Storage Section', 'Storage Row', 'Storage Column',
-            'Aliquot Volume'
-        ]))
-
-        # Data rows
-        for record in records:
-            csv_lines.append(','.join([
-                str(record['id']),
-                f'"{record["drug_name"]}"',
-                str(record['stock_concentration'] or ''),
-                f'"{record["stock_unit"] or ""}"',
-                f'"{record["storage_temp"] or ""}"',
-                f'"{record["supplier"] or ""}"',
-                f'"{record["preparation_date"] or ""}"',
-                f'"{record["notes"] or ""}"',
-                f'"{record["solvents"] or ""}"',
-                f'"{record["solubility"] or ""}"',
-                f'"{record["light_sensitive"] or ""}"',
-                f'"{record["preparation_time"] or ""}"',
-                f'"{record["expiration_time"] or ""}"',
-                f'"{record["sterility"] or ""}"',
-                f'"{record["lot_number"] or ""}"',
-                f'"{record["product_number"] or ""}"',
-                f'"{record["storage_section"] or ""}"',
-                str(record['storage_row'] or ''),
-                str(record['storage_column'] or ''),
-                f'"{record["aliquot_volume"] or ""}"'
-            ]))
-
-        return '\n'.join(csv_lines)
+        return ''.join(self.iter_records_as_csv())
 
     def import_from_csv(self, csv_content, skip_duplicates=True):
         """Import records from CSV content with transaction support.
@@ -563,726 +911,605 @@ class Database:
         All inserts are wrapped in a transaction - if any critical error occurs,
         the entire import is rolled back to maintain database consistency.
         """
-        import csv
-        from io import StringIO
+        return self.import_from_csv_stream(io.StringIO(csv_content), skip_duplicates)
+
+    def import_from_csv_stream(self, csv_file, skip_duplicates=True):
+        """Import records from a text stream of CSV, reading it row by row.
 
+        Rows are inserted with executemany in batches of IMPORT_BATCH_SIZE
+        inside a single transaction, so memory stays bounded by the batch.
+        """
         results = {
             'success': 0,
             'skipped': 0,
             'errors': []
         }
 
-        # Parse CSV
-        csv_reader = csv.DictReader(StringIO(csv_content))
-
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        # Parse CSV lazily as rows are consumed
+        csv_reader = csv.reader(csv_file)
+
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                # Take the write lock up front: the duplicate preload below would otherwise
+                # start a read snapshot that another worker's commit can invalidate mid-import
+                cursor.execute('BEGIN IMMEDIATE')
+
+                # Names already in the table, plus those queued by this import
+                existing_names = set()
+                if skip_duplicates:
+                    names = conn.cursor()
+                    names.row_factory = None  # One-column tuples; no per-row dict needed
+                    existing_names = {name for name, in names.execute('SELECT drug_name FROM drugs')}
+
+                # Cells are read by position from a header map built once;
+                # blank lines are skipped as DictReader would
+                header = next((row for row in csv_reader if row), [])
+                column_index = {name: i for i, name in enumerate(header)}
+                positions = [column_index.get(name) for name in IMPORT_HEADER]
+
+                batch = []
+                for row_num, row in enumerate(filter(None, csv_reader), start=2):  # Start at 2 (1 is header)
+                    try:
+                        # Clean and prepare data; columns missing from the file or row read as blank
+                        width = len(row)
+                        values = [row[i].strip() if i is not None and i < width else '' for i in positions]
+                        drug_name = values[0]
+
+                        if not drug_name:
+                            results['errors'].append(f"Row {row_num}: Missing drug name")
+                            continue
 
-        try:
-            # Begin explicit transaction
-            cursor.execute('BEGIN TRANSACTION')
+                        # Check for duplicates if requested
+                        if skip_duplicates and drug_name in existing_names:
+                            results['skipped'] += 1
+                            continue
 
-            for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 (1 is header)
-                try:
-                    # Clean and prepare data
-                    drug_name = row.get('Drug Name', '').strip()
+                        batch.append(tuple(map(_parse_import_value, values, IMPORT_CONVERTERS)))
+                        if skip_duplicates:
+                            existing_names.add(drug_name)
 
-                    if not drug_name:
-                        results['errors'].append(f"Row {row_num}: Missing drug name")
+                    except Exception as e:
+                        results['errors'].append(f"Row {row_num}: {str(e)}")
                         continue
 
-                    # Check for duplicates if requested
-                    if skip_duplicates:
-                        cursor.execute('SELECT COUNT(*) FROM drugs WHERE drug_name = ?', (drug_name,))
-                        if cursor.fetchone()[0] > 0:
-                            results['skipped'] += 1
-                            continue
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        results['success'] += self._insert_import_batch(cursor, batch)
+                        batch = []
 
-                    # Prepare data
-                    stock_concentration = row.get('Stock Concentration', '').strip()
-                    if stock_concentration:
-                        try:
-                            stock_concentration = float(stock_concentration)
-                        except ValueError:
-                            stock_concentration = None
-                    else:
-                        stock_concentration = None
-
-                    storage_row = row.get('Storage Row', '').strip()
-                    if storage_row:
-                        try:
-                            storage_row = int(storage_row)
-                        except ValueError:
-                            storage_row = None
-                    else:
-                        storage_row = None
-
-                    storage_column = row.get('Storage Column', '').strip()
-                    if storage_column:
-                        try:
-                            storage_column = int(storage_column)
-                        except ValueError:
-                            storage_column = None
-                    else:
-                        storage_column = None
-
-                    # Insert record
-                    cursor.execute('''
-                        INSERT INTO drugs (
-                            drug_name, stock_concentration, stock_unit, storage_temp,
-                            supplier, preparation_date, notes, solvents, solubility,
-                            light_sensitive, preparation_time, expiration_time, sterility,
-                            lot_number, product_number, storage_section, storage_row, storage_column,
-                            aliquot_volume
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        drug_name,
-                        stock_concentration,
-                        row.get('Unit', '').strip() or None,
-                        row.get('Storage Temperature', '').strip() or None,
-                        row.get('Supplier', '').strip() or None,
-                        row.get('Preparation Date', '').strip() or None,
-                        row.get('Notes', '').strip() or None,
-                        row.get('Solvents', '').strip() or None,
-                        row.get('Solubility', '').strip() or None,
-                        row.get('Light Sensitive', '').strip() or None,
-                        row.get('Preparation Time', '').strip() or None,
-                        row.get('Expiration Time', '').strip() or None,
-                        row.get('Sterility', '').strip() or None,
-                        row.get('Lot Number', '').strip() or None,
-                        row.get('Product Number', '').strip() or None,
-                        row.get('Storage Section', '').strip() or None,
-                        storage_row,
-                        storage_column,
-                        row.get('Aliquot Volume', '').strip() or None
-                    ))
-
-                    results['success'] += 1
-
-                except Exception as e:
-                    results['errors'].append(f"Row {row_num}: {str(e)}")
-
-            # Commit the transaction if we got here successfully
-            conn.commit()
-
-        except Exception as e:
-            # Rollback on any critical error
-            conn.rollback()
-            results['errors'].append(f"Critical error - import rolled back: {str(e)}")
-            results['success'] = 0  # Reset success count since we rolled back
+                if batch:
+                    results['success'] += self._insert_import_batch(cursor, batch)
 
-        finally:
-            conn.close()
+                # Commit the transaction if we got here successfully
+                conn.commit()
+
+            except Exception as e:
+                # Rollback on any critical error
+                conn.rollback()
+                results['errors'].append(f"Critical error - import rolled back: {str(e)}")
+                results['success'] = 0  # Reset success count since we rolled back
 
+        self._invalidate('calculator_records')
         return results
 
+    def _insert_import_batch(self, cursor, batch):
+        """Insert a batch of parsed CSV rows, returning how many were written"""
+        # Whole groups go IMPORT_ROWS_PER_STATEMENT rows per statement; the rest one by one
+        step = IMPORT_ROWS_PER_STATEMENT
+        grouped = len(batch) - len(batch) % step
+        cursor.executemany(IMPORT_MULTI_INSERT_SQL, (
+            list(itertools.chain.from_iterable(batch[start:start + step]))
+            for start in range(0, grouped, step)
+        ))
+        cursor.executemany(IMPORT_INSERT_SQL, batch[grouped:])
+        return len(batch)
+
     # ========== VISUAL FRIDGE LAYOUT METHODS ==========
 
     def create_or_update_layout(self, temp_key, section, photo_filename):
         """Create or update a fridge layout with photo"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute('''
+                INSERT INTO fridge_layouts (temp_key, section, photo_filename, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(temp_key, section)
+                DO UPDATE SET photo_filename = ?, updated_at = CURRENT_TIMESTAMP
+                RETURNING id
+            ''', (temp_key, section, photo_filename, photo_filename))
+            # lastrowid is not set by the DO UPDATE path, so read the id back directly
+            layout_id = cursor.fetchone()['id']
 
-        cursor.execute('''
-            INSERT INTO fridge_layouts (temp_key, section, photo_filename, updated_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(temp_key, section)
-            DO UPDATE SET photo_filename = ?, updated_at = CURRENT_TIMESTAMP
-        ''', (temp_key, section, photo_filename, photo_filename))
-
-        layout_id = cursor.lastrowid or cursor.execute(
-            'SELECT id FROM fridge_layouts WHERE temp_key = ? AND section = ?',
-            (temp_key, section)
-        ).fetchone()[0]
-
-        conn.commit()
-        conn.close()
         return layout_id
 
     def get_layout(self, temp_key, section):
         """Get fridge layout for specific temperature and section"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM fridge_layouts
-            WHERE temp_key = ? AND section = ?
-        ''', (temp_key, section))
-        layout = cursor.fetchone()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM fridge_layouts
+                WHERE temp_key = ? AND section = ?
+            ''', (temp_key, section))
+            layout = cursor.fetchone()
         return layout
 
     def get_all_layouts(self):
         """Get all fridge layouts"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridge_layouts ORDER BY temp_key, section')
-        layouts = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fridge_layouts ORDER BY temp_key, section')
+            layouts = cursor.fetchall()
         return layouts
 
     def create_region(self, layout_id, region_name, x, y, width, height):
         """Create a new region on a fridge layout"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT INTO fridge_regions (layout_id, region_name, x, y, width, height)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (layout_id, region_name, x, y, width, height))
+            cursor.execute('''
+                INSERT INTO fridge_regions (layout_id, region_name, x, y, width, height)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (layout_id, region_name, x, y, width, height))
 
-        region_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            region_id = cursor.lastrowid
         return region_id
 
     def update_region(self, region_id, region_name, x, y, width, height):
         """Update an existing region"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE fridge_regions
-            SET region_name = ?, x = ?, y = ?, width = ?, height = ?
-            WHERE id = ?
-        ''', (region_name, x, y, width, height, region_id))
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                UPDATE fridge_regions
+                SET region_name = ?, x = ?, y = ?, width = ?, height = ?
+                WHERE id = ?
+            ''', (region_name, x, y, width, height, region_id))
 
     def delete_region(self, region_id):
         """Delete a region"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM fridge_regions WHERE id = ?', (region_id,))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM fridge_regions WHERE id = ?', (region_id,))
 
     def get_regions_for_layout(self, layout_id):
         """Get all regions for a specific layout"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM fridge_regions
-            WHERE layout_id = ?
-            ORDER BY region_name
-        ''', (layout_id,))
-        regions = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM fridge_regions
+                WHERE layout_id = ?
+                ORDER BY region_name
+            ''', (layout_id,))
+            regions = cursor.fetchall()
         return regions
 
     def get_region_by_id(self, region_id):
         """Get a specific region by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridge_regions WHERE id = ?', (region_id,))
-        region = cursor.fetchone()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fridge_regions WHERE id = ?', (region_id,))
+            region = cursor.fetchone()
         return region
 
     def get_items_in_region(self, region_id):
         """Get all items stored in a specific region"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM drugs
-            WHERE fridge_region_id = ?
-            ORDER BY drug_name
-        ''', (region_id,))
-        items = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM drugs
+                WHERE fridge_region_id = ?
+                ORDER BY drug_name
+            ''', (region_id,))
+            items = cursor.fetchall()
         return items
 
     def assign_item_to_region(self, drug_id, region_id):
         """Assign an inventory item to a visual region"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE drugs
-            SET fridge_region_id = ?
-            WHERE id = ?
-        ''', (region_id, drug_id))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE drugs
+                SET fridge_region_id = ?
+                WHERE id = ?
+            ''', (region_id, drug_id))
 
     def get_region_occupancy(self, layout_id):
         """Get item counts for all regions in a layout"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT fr.id, fr.region_name, COUNT(d.id) as item_count
-            FROM fridge_regions fr
-            LEFT JOIN drugs d ON d.fridge_region_id = fr.id
-            WHERE fr.layout_id = ?
-            GROUP BY fr.id, fr.region_name
-            ORDER BY fr.region_name
-        ''', (layout_id,))
-        occupancy = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT fr.id, fr.region_name, COUNT(d.id) as item_count
+                FROM fridge_regions fr
+                LEFT JOIN drugs d ON d.fridge_region_id = fr.id
+                WHERE fr.layout_id = ?
+                GROUP BY fr.id, fr.region_name
+                ORDER BY fr.region_name
+            ''', (layout_id,))
+            occupancy = cursor.fetchall()
         return occupancy
 
+    def get_layout_bundle(self, temp_key, section):
+        """Get a photo layout with its regions and per-region item counts.
+
+        Returns (layout, regions, occupancy), or None if no layout exists.
+        Everything is read over one connection instead of three.
+        """
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM fridge_layouts
+                WHERE temp_key = ? AND section = ?
+            ''', (temp_key, section))
+            layout = cursor.fetchone()
+            if layout is None:
+                return None
+
+            cursor.execute('''
+                SELECT fr.*, COUNT(d.id) as item_count
+                FROM fridge_regions fr
+                LEFT JOIN drugs d ON d.fridge_region_id = fr.id
+                WHERE fr.layout_id = ?
+                GROUP BY fr.id
+                ORDER BY fr.region_name
+            ''', (layout['id'],))
+            rows = cursor.fetchall()
+
+        regions, occupancy = _split_occupancy(rows, ('id', 'region_name'))
+        return layout, regions, occupancy
+
     # ========== SCHEMATIC LAYOUT METHODS ==========
 
     def create_schematic_layout(self, temp_key, section, layout_name=None, reference_photo=None, fridge_id=None):
         """Create a new schematic layout for a specific fridge"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
 
-        if fridge_id:
-            # Per-fridge layout - check if exists for this fridge
-            cursor.execute('''
-                SELECT id FROM fridge_schematic_layouts
-                WHERE fridge_id = ? AND section = ?
-            ''', (fridge_id, section))
-            existing = cursor.fetchone()
-
-            if existing:
+            if fridge_id:
+                # Per-fridge layout - check if exists for this fridge
                 cursor.execute('''
-                    UPDATE fridge_schematic_layouts
-                    SET layout_name = ?, reference_photo = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (layout_name, reference_photo, existing[0]))
-                layout_id = existing[0]
+                    SELECT id FROM fridge_schematic_layouts
+                    WHERE fridge_id = ? AND section = ?
+                ''', (fridge_id, section))
+                existing = cursor.fetchone()
+
+                if existing:
+                    cursor.execute('''
+                        UPDATE fridge_schematic_layouts
+                        SET layout_name = ?, reference_photo = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (layout_name, reference_photo, existing['id']))
+                    layout_id = existing['id']
+                else:
+                    cursor.execute('''
+                        INSERT INTO fridge_schematic_layouts (temp_key, section, layout_name, reference_photo, fridge_id, updated_at)
+                        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ''', (temp_key, section, layout_name, reference_photo, fridge_id))
+                    layout_id = cursor.lastrowid
             else:
+                # Legacy temp_key based layout (for backwards compatibility)
                 cursor.execute('''
-                    INSERT INTO fridge_schematic_layouts (temp_key, section, layout_name, reference_photo, fridge_id, updated_at)
-                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (temp_key, section, layout_name, reference_photo, fridge_id))
-                layout_id = cursor.lastrowid
-        else:
-            # Legacy temp_key based layout (for backwards compatibility)
-            cursor.execute('''
-                INSERT INTO fridge_schematic_layouts (temp_key, section, layout_name, reference_photo, updated_at)
-                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ON CONFLICT(temp_key, section)
-                DO UPDATE SET layout_name = ?, reference_photo = ?, updated_at = CURRENT_TIMESTAMP
-            ''', (temp_key, section, layout_name, reference_photo, layout_name, reference_photo))
-
-            layout_id = cursor.lastrowid or cursor.execute(
-                'SELECT id FROM fridge_schematic_layouts WHERE temp_key = ? AND section = ?',
-                (temp_key, section)
-            ).fetchone()[0]
+                    INSERT INTO fridge_schematic_layouts (temp_key, section, layout_name, reference_photo, updated_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(temp_key, section)
+                    DO UPDATE SET layout_name = ?, reference_photo = ?, updated_at = CURRENT_TIMESTAMP
+                    RETURNING id
+                ''', (temp_key, section, layout_name, reference_photo, layout_name, reference_photo))
+                layout_id = cursor.fetchone()['id']
 
-        conn.commit()
-        conn.close()
         return layout_id
 
+    def set_schematic_reference_photo(self, layout_id, filename):
+        """Attach a reference photo to a schematic layout"""
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE fridge_schematic_layouts
+                SET reference_photo = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (filename, layout_id))
+
     def get_schematic_layout(self, temp_key, section, fridge_id=None):
         """Get schematic layout for specific fridge or temperature and section"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
 
-        if fridge_id:
-            cursor.execute('''
-                SELECT * FROM fridge_schematic_layouts
-                WHERE fridge_id = ? AND section = ?
-            ''', (fridge_id, section))
-        else:
-            cursor.execute('''
-                SELECT * FROM fridge_schematic_layouts
-                WHERE temp_key = ? AND section = ? AND fridge_id IS NULL
-            ''', (temp_key, section))
+            if fridge_id:
+                cursor.execute('''
+                    SELECT * FROM fridge_schematic_layouts
+                    WHERE fridge_id = ? AND section = ?
+                ''', (fridge_id, section))
+            else:
+                cursor.execute('''
+                    SELECT * FROM fridge_schematic_layouts
+                    WHERE temp_key = ? AND section = ? AND fridge_id IS NULL
+                ''', (temp_key, section))
 
-        layout = cursor.fetchone()
-        conn.close()
+            layout = cursor.fetchone()
         return layout
 
     def get_schematic_layout_by_fridge(self, fridge_id, section):
         """Get schematic layout for a specific fridge and section"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM fridge_schematic_layouts
-            WHERE fridge_id = ? AND section = ?
-        ''', (fridge_id, section))
-        layout = cursor.fetchone()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM fridge_schematic_layouts
+                WHERE fridge_id = ? AND section = ?
+            ''', (fridge_id, section))
+            layout = cursor.fetchone()
         return layout
 
     def get_all_schematic_layouts(self):
         """Get all schematic layouts"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridge_schematic_layouts ORDER BY temp_key, section')
-        layouts = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fridge_schematic_layouts ORDER BY temp_key, section')
+            layouts = cursor.fetchall()
         return layouts
 
     def delete_schematic_layout(self, layout_id):
         """Delete a schematic layout and all its zones"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM fridge_schematic_zones WHERE layout_id = ?', (layout_id,))
-        cursor.execute('DELETE FROM fridge_schematic_layouts WHERE id = ?', (layout_id,))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM fridge_schematic_zones WHERE layout_id = ?', (layout_id,))
+            cursor.execute('DELETE FROM fridge_schematic_layouts WHERE id = ?', (layout_id,))
 
     def add_schematic_zone(self, layout_id, zone_name, row_index, col_index, col_span=1, row_span=1, color='#e3f2fd'):
         """Add a zone to a schematic layout"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            INSERT INTO fridge_schematic_zones (layout_id, zone_name, row_index, col_index, col_span, row_span, color)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (layout_id, zone_name, row_index, col_index, col_span, row_span, color))
+            cursor.execute('''
+                INSERT INTO fridge_schematic_zones (layout_id, zone_name, row_index, col_index, col_span, row_span, color)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (layout_id, zone_name, row_index, col_index, col_span, row_span, color))
 
-        zone_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            zone_id = cursor.lastrowid
         return zone_id
 
     def update_schematic_zone(self, zone_id, zone_name, row_index, col_index, col_span=1, row_span=1, color='#e3f2fd'):
         """Update a schematic zone"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE fridge_schematic_zones
-            SET zone_name = ?, row_index = ?, col_index = ?, col_span = ?, row_span = ?, color = ?
-            WHERE id = ?
-        ''', (zone_name, row_index, col_index, col_span, row_span, color, zone_id))
-
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                UPDATE fridge_schematic_zones
+                SET zone_name = ?, row_index = ?, col_index = ?, col_span = ?, row_span = ?, color = ?
+                WHERE id = ?
+            ''', (zone_name, row_index, col_index, col_span, row_span, color, zone_id))
 
     def delete_schematic_zone(self, zone_id):
         """Delete a schematic zone"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM fridge_schematic_zones WHERE id = ?', (zone_id,))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM fridge_schematic_zones WHERE id = ?', (zone_id,))
 
     def get_schematic_zones(self, layout_id):
         """Get all zones for a schematic layout"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM fridge_schematic_zones
-            WHERE layout_id = ?
-            ORDER BY row_index, col_index
-        ''', (layout_id,))
-        zones = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM fridge_schematic_zones
+                WHERE layout_id = ?
+                ORDER BY row_index, col_index
+            ''', (layout_id,))
+            zones = cursor.fetchall()
         return zones
 
     def get_schematic_zone_by_id(self, zone_id):
         """Get a specific schematic zone"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridge_schematic_zones WHERE id = ?', (zone_id,))
-        zone = cursor.fetchone()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fridge_schematic_zones WHERE id = ?', (zone_id,))
+            zone = cursor.fetchone()
         return zone
 
     def get_items_in_zone(self, zone_id):
         """Get all items stored in a schematic zone"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM drugs
-            WHERE fridge_region_id = ?
-            ORDER BY drug_name
-        ''', (zone_id,))
-        items = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(ZONE_ITEMS_QUERY, (zone_id,))
+            items = cursor.fetchall()
         return items
 
     def assign_item_to_zone(self, drug_id, zone_id):
         """Assign an inventory item to a schematic zone"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE drugs
-            SET fridge_region_id = ?
-            WHERE id = ?
-        ''', (zone_id, drug_id))
-        conn.commit()
-        conn.close()
+        self.assign_items_to_zone([drug_id], zone_id)
+
+    def assign_items_to_zone(self, drug_ids, zone_id):
+        """Assign several inventory items to a schematic zone in one transaction"""
+        with self.write_connection() as conn:
+            conn.executemany('''
+                UPDATE drugs
+                SET fridge_region_id = ?
+                WHERE id = ?
+            ''', [(zone_id, drug_id) for drug_id in drug_ids])
 
     def get_zone_occupancy(self, layout_id):
         """Get item counts for all zones in a schematic layout"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT z.id, z.zone_name, z.row_index, z.col_index, z.color, COUNT(d.id) as item_count
-            FROM fridge_schematic_zones z
-            LEFT JOIN drugs d ON d.fridge_region_id = z.id
-            WHERE z.layout_id = ?
-            GROUP BY z.id, z.zone_name, z.row_index, z.col_index, z.color
-            ORDER BY z.row_index, z.col_index
-        ''', (layout_id,))
-        occupancy = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT z.id, z.zone_name, z.row_index, z.col_index, z.color, COUNT(d.id) as item_count
+                FROM fridge_schematic_zones z
+                LEFT JOIN drugs d ON d.fridge_region_id = z.id
+                WHERE z.layout_id = ?
+                GROUP BY z.id, z.zone_name, z.row_index, z.col_index, z.color
+                ORDER BY z.row_index, z.col_index
+            ''', (layout_id,))
+            occupancy = cursor.fetchall()
         return occupancy
 
+    def get_schematic_bundle(self, temp_key, section, fridge_id=None):
+        """Get a schematic layout with its zones and per-zone item counts.
+
+        Looks the layout up the same way as get_schematic_layout. Returns
+        (layout, zones, occupancy), or None if no layout exists.
+        """
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            if fridge_id:
+                cursor.execute('''
+                    SELECT * FROM fridge_schematic_layouts
+                    WHERE fridge_id = ? AND section = ?
+                ''', (fridge_id, section))
+            else:
+                cursor.execute('''
+                    SELECT * FROM fridge_schematic_layouts
+                    WHERE temp_key = ? AND section = ? AND fridge_id IS NULL
+                ''', (temp_key, section))
+            layout = cursor.fetchone()
+            if layout is None:
+                return None
+
+            cursor.execute('''
+                SELECT z.*, COUNT(d.id) as item_count
+                FROM fridge_schematic_zones z
+                LEFT JOIN drugs d ON d.fridge_region_id = z.id
+                WHERE z.layout_id = ?
+                GROUP BY z.id
+                ORDER BY z.row_index, z.col_index
+            ''', (layout['id'],))
+            rows = cursor.fetchall()
+
+        zones, occupancy = _split_occupancy(
+            rows, ('id', 'zone_name', 'row_index', 'col_index', 'color')
+        )
+        return layout, zones, occupancy
+
     def clear_schematic_zones(self, layout_id):
         """Delete all zones from a schematic layout"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM fridge_schematic_zones WHERE layout_id = ?', (layout_id,))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM fridge_schematic_zones WHERE layout_id = ?', (layout_id,))
+
+    def replace_schematic_zones(self, layout_id, zones):
+        """Replace all zones of a schematic layout in a single transaction"""
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM fridge_schematic_zones WHERE layout_id = ?', (layout_id,))
+            cursor.executemany('''
+                INSERT INTO fridge_schematic_zones (layout_id, zone_name, row_index, col_index, col_span, row_span, color)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(layout_id, zone['zone_name'], zone['row_index'], zone['col_index'],
+                   zone.get('col_span', 1), zone.get('row_span', 1), zone.get('color', '#e3f2fd'))
+                  for zone in zones])
 
     # ========== ANTIBODY METHODS ==========
 
     def get_all_primary_antibodies(self):
         """Get all primary antibodies"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM primary_antibodies ORDER BY name')
-        antibodies = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(PRIMARY_ANTIBODY_LIST_QUERY)
+            antibodies = cursor.fetchall()
         return antibodies
 
     def get_primary_antibody_by_id(self, ab_id):
         """Get a single primary antibody by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM primary_antibodies WHERE id = ?', (ab_id,))
-        antibody = cursor.fetchone()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM primary_antibodies WHERE id = ?', (ab_id,))
+            antibody = cursor.fetchone()
         return antibody
 
     def add_primary_antibody(self, data):
         """Add a new primary antibody"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO primary_antibodies (
-                name, target_protein, host_species, clonality, isotype, clone_number,
-                supplier, catalog_number, lot_number, applications, fixation_compatibility,
-                dilution_if, dilution_wb, dilution_ihc, storage_temp, stock_concentration,
-                aliquot_volume, validated, notes, fridge_region_id,
-                is_conjugated, fluorophore, fluorophore_excitation, fluorophore_emission
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data.get('name'),
-            data.get('target_protein'),
-            data.get('host_species'),
-            data.get('clonality'),
-            data.get('isotype'),
-            data.get('clone_number'),
-            data.get('supplier'),
-            data.get('catalog_number'),
-            data.get('lot_number'),
-            data.get('applications'),
-            data.get('fixation_compatibility'),
-            data.get('dilution_if'),
-            data.get('dilution_wb'),
-            data.get('dilution_ihc'),
-            data.get('storage_temp'),
-            data.get('stock_concentration'),
-            data.get('aliquot_volume'),
-            data.get('validated'),
-            data.get('notes'),
-            data.get('fridge_region_id'),
-            1 if data.get('is_conjugated') else 0,
-            data.get('fluorophore'),
-            data.get('fluorophore_excitation'),
-            data.get('fluorophore_emission')
-        ))
-
-        ab_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_PRIMARY_ANTIBODY_SQL, _primary_antibody_params(data))
+            ab_id = cursor.lastrowid
+        self._invalidate_group('antibody_matches')
         return ab_id
 
     def update_primary_antibody(self, ab_id, data):
         """Update a primary antibody"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE primary_antibodies SET
-                name = ?, target_protein = ?, host_species = ?, clonality = ?,
-                isotype = ?, clone_number = ?, supplier = ?, catalog_number = ?,
-                lot_number = ?, applications = ?, fixation_compatibility = ?,
-                dilution_if = ?, dilution_wb = ?, dilution_ihc = ?, storage_temp = ?,
-                stock_concentration = ?, aliquot_volume = ?, validated = ?, notes = ?,
-                fridge_region_id = ?, is_conjugated = ?, fluorophore = ?,
-                fluorophore_excitation = ?, fluorophore_emission = ?
-            WHERE id = ?
-        ''', (
-            data.get('name'),
-            data.get('target_protein'),
-            data.get('host_species'),
-            data.get('clonality'),
-            data.get('isotype'),
-            data.get('clone_number'),
-            data.get('supplier'),
-            data.get('catalog_number'),
-            data.get('lot_number'),
-            data.get('applications'),
-            data.get('fixation_compatibility'),
-            data.get('dilution_if'),
-            data.get('dilution_wb'),
-            data.get('dilution_ihc'),
-            data.get('storage_temp'),
-            data.get('stock_concentration'),
-            data.get('aliquot_volume'),
-            data.get('validated'),
-            data.get('notes'),
-            data.get('fridge_region_id'),
-            1 if data.get('is_conjugated') else 0,
-            data.get('fluorophore'),
-            data.get('fluorophore_excitation'),
-            data.get('fluorophore_emission'),
-            ab_id
-        ))
-
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            conn.execute(UPDATE_PRIMARY_ANTIBODY_SQL, (*_primary_antibody_params(data), ab_id))
+        self._invalidate_group('antibody_matches')
 
     def delete_primary_antibody(self, ab_id):
         """Delete a primary antibody"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM primary_antibodies WHERE id = ?', (ab_id,))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM primary_antibodies WHERE id = ?', (ab_id,))
+
+        self._invalidate_group('antibody_matches')
 
     def get_all_secondary_antibodies(self):
         """Get all secondary antibodies"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM secondary_antibodies ORDER BY name')
-        antibodies = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SECONDARY_ANTIBODY_LIST_QUERY)
+            antibodies = cursor.fetchall()
         return antibodies
 
     def get_secondary_antibody_by_id(self, ab_id):
         """Get a single secondary antibody by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM secondary_antibodies WHERE id = ?', (ab_id,))
-        antibody = cursor.fetchone()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM secondary_antibodies WHERE id = ?', (ab_id,))
+            antibody = cursor.fetchone()
         return antibody
 
     def add_secondary_antibody(self, data):
         """Add a new secondary antibody"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO secondary_antibodies (
-                name, target_species, target_isotype, host_species, format, conjugate,
-                fluorophore_excitation, fluorophore_emission, cross_adsorbed,
-                cross_adsorbed_against, supplier, catalog_number, lot_number,
-                applications, dilution_if, dilution_wb, dilution_ihc, storage_temp,
-                stock_concentration, aliquot_volume, notes, fridge_region_id
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data.get('name'),
-            data.get('target_species'),
-            data.get('target_isotype'),
-            data.get('host_species'),
-            data.get('format'),
-            data.get('conjugate'),
-            data.get('fluorophore_excitation'),
-            data.get('fluorophore_emission'),
-            data.get('cross_adsorbed'),
-            data.get('cross_adsorbed_against'),
-            data.get('supplier'),
-            data.get('catalog_number'),
-            data.get('lot_number'),
-            data.get('applications'),
-            data.get('dilution_if'),
-            data.get('dilution_wb'),
-            data.get('dilution_ihc'),
-            data.get('storage_temp'),
-            data.get('stock_concentration'),
-            data.get('aliquot_volume'),
-            data.get('notes'),
-            data.get('fridge_region_id')
-        ))
-
-        ab_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_SECONDARY_ANTIBODY_SQL, _secondary_antibody_params(data))
+            ab_id = cursor.lastrowid
+        self._invalidate_group('antibody_matches')
         return ab_id
 
     def update_secondary_antibody(self, ab_id, data):
         """Update a secondary antibody"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE secondary_antibodies SET
-                name = ?, target_species = ?, target_isotype = ?, host_species = ?,
-                format = ?, conjugate = ?, fluorophore_excitation = ?,
-                fluorophore_emission = ?, cross_adsorbed = ?, cross_adsorbed_against = ?,
-                supplier = ?, catalog_number = ?, lot_number = ?, applications = ?,
-                dilution_if = ?, dilution_wb = ?, dilution_ihc = ?, storage_temp = ?,
-                stock_concentration = ?, aliquot_volume = ?, notes = ?, fridge_region_id = ?
-            WHERE id = ?
-        ''', (
-            data.get('name'),
-            data.get('target_species'),
-            data.get('target_isotype'),
-            data.get('host_species'),
-            data.get('format'),
-            data.get('conjugate'),
-            data.get('fluorophore_excitation'),
-            data.get('fluorophore_emission'),
-            data.get('cross_adsorbed'),
-            data.get('cross_adsorbed_against'),
-            data.get('supplier'),
-            data.get('catalog_number'),
-            data.get('lot_number'),
-            data.get('applications'),
-            data.get('dilution_if'),
-            data.get('dilution_wb'),
-            data.get('dilution_ihc'),
-            data.get('storage_temp'),
-            data.get('stock_concentration'),
-            data.get('aliquot_volume'),
-            data.get('notes'),
-            data.get('fridge_region_id'),
-            ab_id
-        ))
-
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            conn.execute(UPDATE_SECONDARY_ANTIBODY_SQL, (*_secondary_antibody_params(data), ab_id))
+        self._invalidate_group('antibody_matches')
 
     def delete_secondary_antibody(self, ab_id):
         """Delete a secondary antibody"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM secondary_antibodies WHERE id = ?', (ab_id,))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM secondary_antibodies WHERE id = ?', (ab_id,))
+
+        self._invalidate_group('antibody_matches')
 
     def find_matching_secondaries(self, primary_id):
         """Find secondary antibodies compatible with a given primary antibody"""
+        return self._cached(('antibody_matches', primary_id),
+                            lambda: self._find_matching_secondaries(primary_id))
+
+    def _find_matching_secondaries(self, primary_id):
+        """Score secondary antibodies against a primary, bypassing the cache"""
         primary = self.get_primary_antibody_by_id(primary_id)
         if not primary:
             return []
 
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get the primary's host species and isotype
-        host_species = primary['host_species']
-        isotype = primary['isotype']
-        clonality = primary['clonality']
+            # Get the primary's host species and isotype
+            host_species = primary['host_species']
+            isotype = primary['isotype']
+            clonality = primary['clonality']
 
-        # Find secondaries that target the primary's host species
-        query = '''
-            SELECT * FROM secondary_antibodies
-            WHERE LOWER(target_species) = LOWER(?)
-        '''
-        params = [host_species]
+            # Find secondaries that target the primary's host species
+            query = '''
+                SELECT * FROM secondary_antibodies
+                WHERE LOWER(target_species) = LOWER(?)
+            '''
+            params = [host_species]
 
-        # If monoclonal and specific isotype, prefer matching isotype or H+L
-        # But still return all that match species
-        cursor.execute(query, params)
-        secondaries = cursor.fetchall()
-        conn.close()
+            # If monoclonal and specific isotype, prefer matching isotype or H+L
+            # But still return all that match species
+            cursor.execute(query, params)
+            secondaries = cursor.fetchall()
 
         # Score and sort the matches
+        primary_isotype = (isotype or '').lower()
+        is_polyclonal = clonality == 'Polyclonal'
         scored = []
         for sec in secondaries:
             score = 0
@@ -1290,15 +1517,14 @@ class Database:
 
             # Check isotype match
             target_isotype = (sec['target_isotype'] or '').lower()
-            primary_isotype = (isotype or '').lower()
 
-            if 'h+l' in target_isotype or 'h&l' in target_isotype:
+            if _BROAD_ISOTYPE_RE.search(target_isotype):
                 score += 2
                 reasons.append("H+L (broad)")
             elif primary_isotype and primary_isotype in target_isotype:
                 score += 3
                 reasons.append(f"Isotype match ({isotype})")
-            elif clonality == 'Polyclonal' and 'igg' in target_isotype:
+            elif is_polyclonal and 'igg' in target_isotype:
                 score += 2
                 reasons.append("IgG for polyclonal")
 
@@ -1308,7 +1534,7 @@ class Database:
                 reasons.append("Cross-adsorbed")
 
             scored.append({
-                'antibody': dict(sec),
+                'antibody': sec,
                 'score': score,
                 'reasons': reasons
             })
@@ -1321,108 +1547,111 @@ class Database:
 
     def get_setting(self, key):
         """Get a setting value by key"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
-        result = cursor.fetchone()
-        conn.close()
-        return result['value'] if result else None
+        return self._cached('settings', self._load_settings).get(key)
 
     def set_setting(self, key, value):
         """Set a setting value"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
-        ''', (key, value))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
+            ''', (key, value))
+
+        self._invalidate('settings')
+
+    def set_settings(self, settings):
+        """Set several settings in one transaction"""
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
+            ''', list(settings.items()))
+
+        self._invalidate('settings')
 
     def get_all_settings(self):
         """Get all settings as a dictionary"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT key, value FROM settings')
-        results = cursor.fetchall()
-        conn.close()
-        return {row['key']: row['value'] for row in results}
+        return dict(self._cached('settings', self._load_settings))
+
+    def get_all_settings_with_etag(self):
+        """Get all settings with an etag identifying this version"""
+        settings, etag = self._cached_with_etag('settings', self._load_settings)
+        return dict(settings), etag
+
+    def _load_settings(self):
+        """Query all settings, bypassing the cache"""
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute('SELECT key, value FROM settings')
+            return dict(cursor)
 
     # ========== FRIDGE MANAGEMENT METHODS ==========
 
     def get_all_fridges(self):
         """Get all user-defined fridges"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridges ORDER BY name')
-        fridges = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fridges ORDER BY name')
+            fridges = cursor.fetchall()
         return fridges
 
     def get_fridge_by_id(self, fridge_id):
         """Get a single fridge by ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridges WHERE id = ?', (fridge_id,))
-        fridge = cursor.fetchone()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fridges WHERE id = ?', (fridge_id,))
+            fridge = cursor.fetchone()
         return fridge
 
     def add_fridge(self, data):
         """Add a new fridge"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO fridges (name, temp_type, location, has_door)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            data.get('name'),
-            data.get('temp_type'),
-            data.get('location'),
-            1 if data.get('has_door', True) else 0
-        ))
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
 
-        fridge_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                INSERT INTO fridges (name, temp_type, location, has_door)
+                VALUES (?, ?, ?, ?)
+            ''', (
+                data.get('name'),
+                data.get('temp_type'),
+                data.get('location'),
+                1 if data.get('has_door', True) else 0
+            ))
+
+            fridge_id = cursor.lastrowid
         return fridge_id
 
     def update_fridge(self, fridge_id, data):
         """Update a fridge"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE fridges SET
-                name = ?,
-                temp_type = ?,
-                location = ?,
-                has_door = ?
-            WHERE id = ?
-        ''', (
-            data.get('name'),
-            data.get('temp_type'),
-            data.get('location'),
-            1 if data.get('has_door', True) else 0,
-            fridge_id
-        ))
-
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                UPDATE fridges SET
+                    name = ?,
+                    temp_type = ?,
+                    location = ?,
+                    has_door = ?
+                WHERE id = ?
+            ''', (
+                data.get('name'),
+                data.get('temp_type'),
+                data.get('location'),
+                1 if data.get('has_door', True) else 0,
+                fridge_id
+            ))
 
     def delete_fridge(self, fridge_id):
         """Delete a fridge"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM fridges WHERE id = ?', (fridge_id,))
-        conn.commit()
-        conn.close()
+        with self.write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM fridges WHERE id = ?', (fridge_id,))
 
     def get_fridges_by_temp_type(self, temp_type):
         """Get all fridges of a specific temperature type"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM fridges WHERE temp_type = ? ORDER BY name', (temp_type,))
-        fridges = cursor.fetchall()
-        conn.close()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fridges WHERE temp_type = ? ORDER BY name', (temp_type,))
+            fridges = cursor.fetchall()
         return fridges
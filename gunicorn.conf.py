@@ -0,0 +1,38 @@
+"""
+gunicorn configuration for Lab Management System
+
+Run with:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker process gets its own SQLite connections (see post_fork), and
+uses threads so a worker keeps serving while a request waits on disk.
+Set LAB_WORKER_CLASS=gevent to use the gevent worker described in wsgi.py
+instead; passing -k gevent on the command line also needs --no-preload.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('LAB_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('LAB_WORKERS', multiprocessing.cpu_count()))
+worker_class = os.environ.get('LAB_WORKER_CLASS', 'gthread')
+threads = 4
+
+# Import the app once in the master so workers fork with it already loaded.
+# gevent workers must import it themselves, after monkey-patching, or the
+# database locks and pool queue are built from unpatched threading/queue
+preload_app = worker_class == 'gthread'
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections"""
+    if not server.cfg.preload_app:
+        return  # The worker imports the app itself, with fresh connections
+    from app import db
+    db.reset_after_fork()
+
+
+def worker_exit(server, worker):
+    """Refresh planner statistics and close the worker's database connections"""
+    from app import db
+    db.close()
@@ -7,6 +7,9 @@ import sqlite3
 import shutil
 from datetime import datetime
 
+# Old rows are copied this many at a time
+MIGRATE_BATCH_SIZE = 1000
+
 # Backup the database first
 backup_name = f'lab_management_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
 print(f"Creating backup: {backup_name}")
@@ -78,14 +81,13 @@ print("OK - Created new table schema")
 
 # Step 3: Copy data from old table to new table with column mapping
 print("\n--- Migrating data ---")
-cursor.execute('SELECT * FROM drugs')
-old_records = cursor.fetchall()
 
 # Get column names from old table
 old_column_names = [col[1] for col in columns]
 
-migrated_count = 0
-for record in old_records:
+
+def remap_record(record):
+    """Map one old-schema row to a drugs_new parameter tuple"""
     # Create a dictionary of old data
     old_data = dict(zip(old_column_names, record))
 
@@ -123,16 +125,7 @@ for record in old_records:
         except (ValueError, TypeError):
             new_data['stock_concentration'] = None
 
-    # Insert into new table
-    cursor.execute('''
-        INSERT INTO drugs_new (
-            id, drug_name, stock_concentration, stock_unit, storage_temp,
-            supplier, preparation_date, notes, solvents, solubility,
-            light_sensitive, preparation_time, expiration_time, sterility,
-            lot_number, product_number, storage_section, storage_row, storage_column,
-            aliquot_volume, preparation_method, date_created, category
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+    return (
         new_data['id'],
         new_data['drug_name'],
         new_data['stock_concentration'],
@@ -156,8 +149,26 @@ for record in old_records:
         new_data['preparation_method'],
         new_data['date_created'],
         new_data['category']
-    ))
-    migrated_count += 1
+    )
+
+
+# Stream the old rows in batches from a separate read cursor so only one
+# batch is held in memory, inside the same transaction as the table swap
+read_cursor = conn.cursor()
+read_cursor.execute('SELECT * FROM drugs')
+
+migrated_count = 0
+for batch in iter(lambda: read_cursor.fetchmany(MIGRATE_BATCH_SIZE), []):
+    cursor.executemany('''
+        INSERT INTO drugs_new (
+            id, drug_name, stock_concentration, stock_unit, storage_temp,
+            supplier, preparation_date, notes, solvents, solubility,
+            light_sensitive, preparation_time, expiration_time, sterility,
+            lot_number, product_number, storage_section, storage_row, storage_column,
+            aliquot_volume, preparation_method, date_created, category
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [remap_record(record) for record in batch])
+    migrated_count += len(batch)
 
 print(f"OK - Migrated {migrated_count} records")
 
@@ -172,6 +183,15 @@ cursor.execute('SELECT COUNT(*) FROM drugs')
 final_count = cursor.fetchone()[0]
 print(f"\nOK - Verification: {final_count} records in new table")
 
+# Step 6: Dropping the old table also dropped its indexes and search triggers.
+# Clearing the schema version makes the app recreate them on its next start,
+# and the search index is rebuilt here from the migrated rows
+cursor.execute('PRAGMA user_version = 0')
+cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='drugs_fts'")
+if cursor.fetchone():
+    cursor.execute("INSERT INTO drugs_fts(drugs_fts) VALUES ('rebuild')")
+    print("OK - Search index rebuilt")
+
 # Commit changes
 conn.commit()
 conn.close()
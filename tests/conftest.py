@@ -3,7 +3,6 @@ Pytest fixtures for Lab Management System tests
 """
 
 import pytest
-import tempfile
 import os
 import sys
 
@@ -15,17 +14,13 @@ from database import Database
 
 
 @pytest.fixture
-def test_db():
+def test_db(tmp_path):
     """Create a temporary database for testing"""
-    fd, db_path = tempfile.mkstemp(suffix='.db')
-    os.close(fd)
-
-    db = Database(db_path)
+    db = Database(str(tmp_path / 'test.db'))
     yield db
 
-    # Cleanup
-    if os.path.exists(db_path):
-        os.remove(db_path)
+    # pytest removes tmp_path, including the -wal/-shm files
+    db.close()
 
 
 @pytest.fixture
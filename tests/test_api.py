@@ -5,6 +5,7 @@ Tests routes, request handling, and response formats
 
 import pytest
 import json
+import os
 
 
 class TestRecordAPI:
@@ -112,6 +113,25 @@ class TestRecordAPI:
         get_response = client.get(f'/api/record/{record_id}')
         assert get_response.status_code == 404
 
+    def test_get_records_paginated(self, client, sample_record):
+        """Test limit/offset pagination of the records list"""
+        for i in range(5):
+            sample_record['drug_name'] = f'Drug {i}'
+            client.post('/api/record',
+                data=json.dumps(sample_record),
+                content_type='application/json'
+            )
+
+        response = client.get('/api/records?limit=2&offset=1')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [r['drug_name'] for r in data] == ['Drug 3', 'Drug 2']
+
+        # Without a limit every record is returned
+        response = client.get('/api/records?offset=3')
+        assert [r['drug_name'] for r in json.loads(response.data)] == ['Drug 1', 'Drug 0']
+
     def test_search_records(self, client, sample_record):
         """Test searching records"""
         # Add some records
@@ -161,6 +181,37 @@ class TestRecordAPI:
         assert data[0]['drug_name'] == 'Drug 4C'
 
 
+class TestJSONProvider:
+    """Tests for the orjson-backed JSON provider"""
+
+    def test_unicode_round_trip(self, client, sample_record):
+        """Test that non-ASCII units survive request parsing and jsonify"""
+        sample_record['stock_unit'] = 'µM'
+        add_response = client.post('/api/record',
+            data=json.dumps(sample_record),
+            content_type='application/json'
+        )
+        record_id = json.loads(add_response.data)['id']
+
+        response = client.get(f'/api/record/{record_id}')
+
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.data)['stock_unit'] == 'µM'
+
+    def test_tojson_escapes_html(self, client, sample_record):
+        """Test that records embedded in pages are still HTML-escaped"""
+        sample_record['drug_name'] = '</script>'
+        client.post('/api/record',
+            data=json.dumps(sample_record),
+            content_type='application/json'
+        )
+
+        response = client.get('/calculator/dilution')
+
+        assert b'</script>"' not in response.data
+        assert b'\\u003c/script\\u003e' in response.data
+
+
 class TestStorageValidation:
     """Tests for storage location validation"""
 
@@ -192,6 +243,24 @@ class TestStorageValidation:
 
         assert response.status_code == 200
 
+    def test_80c_door_storage_rejected_on_update(self, client, sample_record):
+        """Test that updates go through the same storage validation"""
+        add_response = client.post('/api/record',
+            data=json.dumps(sample_record),
+            content_type='application/json'
+        )
+        record_id = json.loads(add_response.data)['id']
+
+        sample_record['storage_temp'] = '-80C'
+        sample_record['storage_section'] = 'door'
+        response = client.put(f'/api/record/{record_id}',
+            data=json.dumps(sample_record),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+        assert '-80C' in json.loads(response.data)['error']
+
 
 class TestFridgeConfigAPI:
     """Tests for fridge configuration API"""
@@ -260,6 +329,47 @@ class TestFridgeConfigAPI:
         assert data['config']['door_columns'] == 0
 
 
+class TestConditionalRequests:
+    """Tests for ETag revalidation of config and settings endpoints"""
+
+    def test_fridge_config_not_modified(self, client):
+        """Test that a matching If-None-Match gets an empty 304"""
+        response = client.get('/api/fridge/config')
+        etag = response.headers['ETag']
+
+        response = client.get('/api/fridge/config', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_fridge_config_etag_changes_on_update(self, client):
+        """Test that updating a config invalidates the previous ETag"""
+        etag = client.get('/api/fridge/config').headers['ETag']
+        client.put('/api/fridge/config/4C',
+            data=json.dumps({'body_rows': 5, 'body_columns': 5, 'door_rows': 2, 'door_columns': 2}),
+            content_type='application/json'
+        )
+
+        response = client.get('/api/fridge/config', headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_settings_etag_changes_on_update(self, client):
+        """Test that saving settings invalidates the previous ETag"""
+        etag = client.get('/api/settings').headers['ETag']
+        assert client.get('/api/settings', headers={'If-None-Match': etag}).status_code == 304
+
+        client.post('/api/settings',
+            data=json.dumps({'lab_name': 'ETag Lab'}),
+            content_type='application/json'
+        )
+        response = client.get('/api/settings', headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert json.loads(response.data)['lab_name'] == 'ETag Lab'
+
+
 class TestLocationAPI:
     """Tests for storage location API"""
 
@@ -310,6 +420,46 @@ class TestPageRoutes:
         response = client.get('/import-export')
         assert response.status_code == 200
 
+    def test_cached_page_reflects_settings(self, client, test_db):
+        """Test that a cached page is re-rendered after settings change"""
+        client.get('/antibodies')
+        test_db.set_setting('lab_name', 'Cached Lab Name')
+
+        response = client.get('/antibodies')
+
+        assert response.status_code == 200
+        assert b'Cached Lab Name' in response.data
+
+    def test_import_csv_upload(self, client, sample_csv_content):
+        """Test importing an uploaded CSV file"""
+        import io
+        response = client.post('/import/csv', data={
+            'file': (io.BytesIO(sample_csv_content.encode('utf-8')), 'inventory.csv'),
+            'skip_duplicates': 'true'
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['imported'] == 3
+        assert data['errors'] == []
+
+        records = json.loads(client.get('/api/records').data)
+        assert 'µM' in [r['stock_unit'] for r in records]
+
+    def test_export_csv_download(self, client, sample_record):
+        """Test CSV export is served as an attachment"""
+        client.post('/api/record',
+            data=json.dumps(sample_record),
+            content_type='application/json'
+        )
+
+        response = client.get('/export/csv')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert 'attachment; filename=lab_inventory_' in response.headers['Content-Disposition']
+        assert 'Test Drug' in response.get_data(as_text=True)
+
     def test_dilution_calculator_page(self, client):
         """Test dilution calculator page loads"""
         response = client.get('/calculator/dilution')
@@ -319,3 +469,346 @@ class TestPageRoutes:
         """Test actual concentration calculator page loads"""
         response = client.get('/calculator/actual-concentration')
         assert response.status_code == 200
+
+
+class TestSchematicAPI:
+    """Tests for schematic layout API"""
+
+    def test_get_schematic_layout_by_fridge(self, client, sample_record):
+        """Test that layout, zones and occupancy come back together"""
+        create_response = client.post('/api/schematic/create',
+            data=json.dumps({'temp_key': '4C', 'section': 'body', 'fridge_id': 1}),
+            content_type='application/json'
+        )
+        layout_id = json.loads(create_response.data)['layout_id']
+
+        client.post(f'/api/schematic/{layout_id}/zones',
+            data=json.dumps({'zones': [
+                {'zone_name': 'Shelf 1', 'row_index': 0, 'col_index': 0},
+                {'zone_name': 'Shelf 2', 'row_index': 1, 'col_index': 0}
+            ]}),
+            content_type='application/json'
+        )
+
+        response = client.get('/api/schematic/fridge/1/body')
+        data = json.loads(response.data)
+        zone_id = data['zones'][0]['id']
+
+        add_response = client.post('/api/record',
+            data=json.dumps(sample_record),
+            content_type='application/json'
+        )
+        record_id = json.loads(add_response.data)['id']
+        client.post(f'/api/schematic/zone/{zone_id}/assign',
+            data=json.dumps({'drug_id': record_id}),
+            content_type='application/json'
+        )
+
+        response = client.get('/api/schematic/fridge/1/body')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['layout']['id'] == layout_id
+        assert [z['zone_name'] for z in data['zones']] == ['Shelf 1', 'Shelf 2']
+        assert 'item_count' not in data['zones'][0]
+        assert [o['item_count'] for o in data['occupancy']] == [1, 0]
+
+    def test_assign_several_items_to_zone(self, client, sample_record):
+        """Test assigning a list of items to a zone in one request"""
+        record_ids = []
+        for i in range(3):
+            sample_record['drug_name'] = f'Drug {i}'
+            response = client.post('/api/record',
+                data=json.dumps(sample_record),
+                content_type='application/json'
+            )
+            record_ids.append(json.loads(response.data)['id'])
+
+        response = client.post('/api/schematic/zone/7/assign',
+            data=json.dumps({'drug_ids': record_ids}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        items = json.loads(client.get('/api/schematic/zone/7/items').data)
+        assert sorted(item['id'] for item in items) == sorted(record_ids)
+
+    def test_assign_to_zone_requires_items(self, client):
+        """Test that an assignment without drug_id or drug_ids is rejected"""
+        response = client.post('/api/schematic/zone/7/assign',
+            data=json.dumps({}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+
+    def test_assign_to_zone_rejects_non_integer_ids(self, client, sample_record):
+        """Test that strings, objects and non-list drug_ids are rejected without assigning anything"""
+        for i in range(2):
+            client.post('/api/record', data=json.dumps(sample_record), content_type='application/json')
+
+        for payload in [{'drug_ids': '12'}, {'drug_ids': 12}, {'drug_ids': {'id': 1}},
+                        {'drug_ids': [1, 'x']}, {'drug_ids': [True]}, {'drug_id': '1'}]:
+            response = client.post('/api/schematic/zone/7/assign',
+                data=json.dumps(payload),
+                content_type='application/json'
+            )
+            assert response.status_code == 400, payload
+
+        assert json.loads(client.get('/api/schematic/zone/7/items').data) == []
+
+    def test_assign_to_zone_reports_bad_ids_and_bodies(self, client):
+        """Test that drug_id 0 is a type error and a non-object JSON body is a 400, not a 500"""
+        response = client.post('/api/schematic/zone/7/assign',
+            data=json.dumps({'drug_id': 0}),
+            content_type='application/json'
+        )
+        assert response.status_code == 400
+        assert 'positive integer' in json.loads(response.data)['error']
+
+        for body in ['null', '[1]']:
+            response = client.post('/api/schematic/zone/7/assign',
+                data=body,
+                content_type='application/json'
+            )
+            assert response.status_code == 400, body
+
+    def test_get_schematic_layout_missing(self, client):
+        """Test that a missing layout returns an empty payload"""
+        response = client.get('/api/schematic/fridge/99/body')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['layout'] is None
+        assert data['zones'] == []
+
+
+class TestUnitConversion:
+    """Tests for unit conversion factors"""
+
+    def test_same_family(self):
+        """Test conversions within a unit family"""
+        from app import get_unit_conversion_factor
+        assert get_unit_conversion_factor('mM', 'µM') == pytest.approx(1000)
+        assert get_unit_conversion_factor('µg/µL', 'mg/mL') == pytest.approx(1)
+        assert get_unit_conversion_factor('IU/mL', 'U/mL') == 1
+
+    def test_incompatible_units(self):
+        """Test that units from different families do not convert"""
+        from app import get_unit_conversion_factor
+        assert get_unit_conversion_factor('mM', 'mg/mL') is None
+        assert get_unit_conversion_factor('%', 'X') is None
+
+    def test_identical_units(self):
+        """Test that identical units convert even outside known families"""
+        from app import get_unit_conversion_factor
+        assert get_unit_conversion_factor('X', 'X') == 1.0
+        assert get_unit_conversion_factor('cells/mL', 'cells/mL') == 1.0
+
+
+class TestCalculatorAPI:
+    """Tests for calculator API endpoints"""
+
+    def test_actual_concentration(self, client):
+        """Test final concentrations for several components"""
+        response = client.post('/api/calculator/actual-concentration',
+            data=json.dumps({
+                'media_volume': 10,
+                'components': [
+                    {'name': 'A', 'stock_concentration': 100, 'volume': 100, 'volume_unit': 'µL'},
+                    {'stock_concentration': 10, 'volume': 1, 'volume_unit': 'mL'}
+                ]
+            }),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 200
+        results = json.loads(response.data)['results']
+        assert results[0]['final_concentration'] == pytest.approx(100 * 0.1 / 10.1, abs=1e-6)
+        assert results[0]['final_volume'] == 10.1
+        assert results[1]['name'] == 'Component 2'
+        assert results[1]['final_concentration'] == pytest.approx(10 / 11, abs=1e-6)
+
+    def test_actual_concentration_invalid_component(self, client):
+        """Test that an invalid component is reported by position"""
+        response = client.post('/api/calculator/actual-concentration',
+            data=json.dumps({
+                'media_volume': 10,
+                'components': [
+                    {'stock_concentration': 100, 'volume': 100},
+                    {'stock_concentration': -1, 'volume': 100}
+                ]
+            }),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+        assert 'Component 2' in json.loads(response.data)['error']
+
+    def test_dilution_validation_messages(self, client):
+        """Test dilution validation errors for missing, invalid and out-of-range values"""
+        payload = {'stock_concentration': 10, 'final_concentration': 1, 'final_volume': 10}
+        cases = [
+            ({'final_volume': ''}, 'Final Volume is required'),
+            ({'final_concentration': 'abc'}, 'All concentration and volume values must be valid numbers'),
+            ({'final_concentration': -1}, 'Final concentration must be a positive number'),
+            ({'stock_concentration': 1e13}, 'Values cannot exceed 1000000000000.0'),
+        ]
+        for override, message in cases:
+            response = client.post('/api/calculator/dilution',
+                data=json.dumps({**payload, **override}),
+                content_type='application/json'
+            )
+            assert response.status_code == 400
+            assert json.loads(response.data)['error'] == message
+
+    def test_media_volume_required(self, client):
+        """Test that media volume is validated before components"""
+        response = client.post('/api/calculator/actual-concentration',
+            data=json.dumps({'components': []}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+        assert json.loads(response.data)['error'] == 'Media volume is required'
+
+
+class TestPhotoUploads:
+    """Tests for fridge photo uploads and serving"""
+
+    def test_upload_layout_photo_sharded(self, client, tmp_path, monkeypatch):
+        """Test that uploaded photos are stored in a shard subfolder"""
+        import io
+        from app import app
+        monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+
+        response = client.post('/api/layout/upload', data={
+            'photo': (io.BytesIO(b'fake image'), 'fridge.png'),
+            'temp_key': '4C',
+            'section': 'body'
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        filename = json.loads(response.data)['filename']
+        shard, name = filename.split('/')
+        assert len(shard) == 2
+        assert (tmp_path / shard / name).read_bytes() == b'fake image'
+        assert not list(tmp_path.rglob('*.part'))
+
+    @pytest.mark.skipif(os.name == 'nt', reason='POSIX permission bits')
+    def test_uploaded_photo_is_world_readable(self, client, tmp_path, monkeypatch):
+        """Test that stored photos get umask-filtered 0o666 so a web server can read them"""
+        import io
+        from app import app
+        monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+
+        old_umask = os.umask(0o022)
+        try:
+            response = client.post('/api/layout/upload', data={
+                'photo': (io.BytesIO(b'fake image'), 'fridge.png'),
+                'temp_key': '4C',
+                'section': 'body'
+            }, content_type='multipart/form-data')
+        finally:
+            os.umask(old_umask)
+
+        filename = json.loads(response.data)['filename']
+        assert (tmp_path / filename).stat().st_mode & 0o777 == 0o644
+
+    def test_upload_rejects_invalid_extension(self, client):
+        """Test that both upload routes reject non-image files"""
+        import io
+        for url, form in [('/api/layout/upload', {'temp_key': '4C', 'section': 'body'}),
+                          ('/api/schematic/upload-reference', {'layout_id': '1'})]:
+            response = client.post(url, data={
+                'photo': (io.BytesIO(b'text'), 'notes.TXT'), **form
+            }, content_type='multipart/form-data')
+
+            assert response.status_code == 400
+            assert 'Invalid file type' in json.loads(response.data)['error']
+
+    def test_photos_are_cacheable(self, client, tmp_path, monkeypatch):
+        """Test that served photos carry long-lived cache headers"""
+        from app import app
+        monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+        (tmp_path / 'fridge_photos').mkdir()
+        (tmp_path / 'fridge_photos' / 'test_cache_photo.png').write_bytes(b'fake image')
+
+        response = client.get('/static/fridge_photos/test_cache_photo.png')
+        assert response.status_code == 200
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 7 * 24 * 3600
+        response.close()
+
+
+class TestCompression:
+    """Tests for gzip response compression"""
+
+    def test_json_gzipped_when_accepted(self, client, sample_record):
+        """Test that large JSON responses are gzipped for gzip-capable clients"""
+        import gzip
+        for i in range(10):
+            sample_record['drug_name'] = f'Drug {i}'
+            client.post('/api/record',
+                data=json.dumps(sample_record),
+                content_type='application/json'
+            )
+
+        response = client.get('/api/records', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert len(json.loads(gzip.decompress(response.data))) == 10
+
+    def test_not_gzipped_without_accept_encoding(self, client, sample_record):
+        """Test that clients without gzip support get plain JSON"""
+        client.post('/api/record',
+            data=json.dumps(sample_record),
+            content_type='application/json'
+        )
+
+        response = client.get('/api/records')
+
+        assert 'Content-Encoding' not in response.headers
+        assert len(json.loads(response.data)) == 1
+
+    def test_small_responses_not_gzipped(self, client):
+        """Test that tiny responses are sent uncompressed"""
+        response = client.get('/api/records', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'Content-Encoding' not in response.headers
+
+
+class TestRequiredFields:
+    """Tests for required-field validation on fridge and antibody endpoints"""
+
+    def test_add_fridge_requires_name(self, client):
+        """Test that a fridge without a name is rejected"""
+        response = client.post('/api/fridges',
+            data=json.dumps({'temp_type': '4C'}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+        assert json.loads(response.data)['error'] == 'Fridge name is required'
+
+    def test_add_fridge_requires_temp_type(self, client):
+        """Test that a fridge without a temperature type is rejected"""
+        response = client.post('/api/fridges',
+            data=json.dumps({'name': 'Lab Fridge'}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 400
+        assert json.loads(response.data)['error'] == 'Temperature type is required'
+
+    def test_add_antibody_requires_name(self, client):
+        """Test that an antibody without a name is rejected"""
+        for kind in ('primary', 'secondary'):
+            response = client.post(f'/api/antibodies/{kind}',
+                data=json.dumps({'name': ''}),
+                content_type='application/json'
+            )
+
+            assert response.status_code == 400
+            assert json.loads(response.data)['error'] == 'Antibody name is required'
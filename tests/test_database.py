@@ -32,6 +32,17 @@ class TestDatabaseRecords:
         records = test_db.get_all_records()
         assert len(records) == 2
 
+    def test_get_all_records_with_temp_filter(self, test_db, sample_record):
+        """Test retrieving records at one storage temperature"""
+        sample_record['storage_temp'] = '4C'
+        test_db.add_record(sample_record)
+        sample_record['storage_temp'] = '-20C'
+        test_db.add_record(sample_record)
+
+        records = test_db.get_all_records(temp_filter='-20C')
+        assert len(records) == 1
+        assert records[0]['storage_temp'] == '-20C'
+
     def test_get_record_by_id(self, test_db, sample_record):
         """Test retrieving a record by ID"""
         record_id = test_db.add_record(sample_record)
@@ -41,6 +52,33 @@ class TestDatabaseRecords:
         assert record['id'] == record_id
         assert record['drug_name'] == 'Test Drug'
 
+    def test_records_are_plain_dicts(self, test_db, sample_record):
+        """Test that rows come back as dicts ready for JSON serialization"""
+        test_db.add_record(sample_record)
+
+        records = test_db.get_all_records()
+        assert type(records[0]) is dict
+        assert list(records[0])[:2] == ['id', 'drug_name']
+
+    def test_interleaved_cursors_keep_their_columns(self, test_db):
+        """Test that cached column names follow the cursor being read"""
+        with test_db.read_connection() as conn:
+            configs = conn.execute('SELECT temp_key FROM fridge_config')
+            settings = conn.execute('SELECT key, value FROM settings')
+            assert list(configs.fetchone()) == ['temp_key']
+            assert list(settings.fetchone()) == ['key', 'value']
+            assert list(configs.fetchone()) == ['temp_key']
+
+    def test_record_listings_avoid_sorting(self, test_db):
+        """Test that newest-first listings read in index order without a sort step"""
+        with test_db.read_connection() as conn:
+            for query, params in [
+                ('SELECT * FROM drugs ORDER BY id DESC', ()),
+                ('SELECT * FROM drugs WHERE storage_temp = ? ORDER BY id DESC', ('4C',)),
+            ]:
+                plan = [step['detail'] for step in conn.execute('EXPLAIN QUERY PLAN ' + query, params)]
+                assert not any('TEMP B-TREE' in step for step in plan), plan
+
     def test_get_nonexistent_record(self, test_db):
         """Test retrieving a record that doesn't exist"""
         record = test_db.get_record_by_id(99999)
@@ -110,6 +148,46 @@ class TestDatabaseRecords:
         assert results[0]['drug_name'] == 'Drug 4C'
 
 
+    def test_calculator_records_refresh(self, test_db, sample_record):
+        """Test the calculator projection follows record changes"""
+        assert test_db.get_calculator_records() == []
+
+        record_id = test_db.add_record(sample_record)
+        records = test_db.get_calculator_records()
+        assert records == [{
+            'id': record_id,
+            'drug_name': sample_record['drug_name'],
+            'stock_concentration': sample_record['stock_concentration'],
+            'stock_unit': sample_record['stock_unit'],
+        }]
+
+        test_db.delete_record(record_id)
+        assert test_db.get_calculator_records() == []
+
+
+    def test_search_follows_updates_and_deletes(self, test_db, sample_record):
+        """Test that search results track record edits and deletions"""
+        sample_record['drug_name'] = 'Aspirin'
+        record_id = test_db.add_record(sample_record)
+
+        sample_record['drug_name'] = 'Rapamycin'
+        test_db.update_record(record_id, sample_record)
+        assert test_db.search_records('Aspirin') == []
+        assert [r['id'] for r in test_db.search_records('pamy')] == [record_id]
+
+        test_db.delete_record(record_id)
+        assert test_db.search_records('pamy') == []
+
+    def test_search_short_and_quoted_terms(self, test_db, sample_record):
+        """Test searching with terms too short for trigrams or containing quotes"""
+        sample_record['drug_name'] = 'Vitamin "D3"'
+        test_db.add_record(sample_record)
+
+        assert len(test_db.search_records('D3')) == 1
+        assert len(test_db.search_records('"d3"')) == 1
+        assert len(test_db.search_records('VITAMIN')) == 1
+
+
 class TestCSVImport:
     """Tests for CSV import functionality"""
 
@@ -219,6 +297,46 @@ New Drug 2,20,µM'''
         records = test_db.get_all_records()
         assert len(records) == 3
 
+    def test_import_csv_skips_duplicates_within_file(self, test_db):
+        """Test that a name repeated in the same file is only imported once"""
+        csv_content = '''Drug Name,Stock Concentration,Unit
+Drug A,10,mM
+Drug A,20,mM'''
+
+        results = test_db.import_from_csv(csv_content, skip_duplicates=True)
+        assert results['success'] == 1
+        assert results['skipped'] == 1
+
+    def test_import_csv_short_rows_and_column_order(self, test_db):
+        """Test that columns are matched by header name and short rows read as blank"""
+        csv_content = 'Supplier,Drug Name,Storage Row\nSigma,Drug A,2\nAcme,Drug B\n'
+
+        results = test_db.import_from_csv(csv_content)
+
+        assert results['success'] == 2
+        records = {r['drug_name']: r for r in test_db.get_all_records()}
+        assert records['Drug A']['supplier'] == 'Sigma'
+        assert records['Drug A']['storage_row'] == 2
+        assert records['Drug B']['supplier'] == 'Acme'
+        assert records['Drug B']['storage_row'] is None
+
+    def test_import_csv_multiple_batches(self, test_db):
+        """Test importing more rows than fit in one insert batch"""
+        from database import IMPORT_BATCH_SIZE
+        count = IMPORT_BATCH_SIZE * 2 + 1
+        csv_content = 'Drug Name,Stock Concentration\n' + '\n'.join(
+            f'Drug {i},{i}' for i in range(count)
+        )
+
+        results = test_db.import_from_csv(csv_content)
+        assert results['success'] == count
+        records = test_db.get_all_records()
+        assert len(records) == count
+        # Rows keep file order and their values across grouped inserts
+        assert [(r['drug_name'], r['stock_concentration']) for r in reversed(records)] == [
+            (f'Drug {i}', float(i)) for i in range(count)
+        ]
+
 
 class TestCSVExport:
     """Tests for CSV export functionality"""
@@ -246,6 +364,29 @@ class TestCSVExport:
         assert len(lines) == 1  # Just header
         assert 'Drug Name' in lines[0]
 
+    def test_export_csv_chunks(self, test_db):
+        """Test that the streamed export yields the header then batches of rows"""
+        from database import EXPORT_BATCH_SIZE
+        test_db.import_from_csv('Drug Name\n' + '\n'.join(f'Drug {i}' for i in range(EXPORT_BATCH_SIZE + 1)))
+
+        chunks = list(test_db.iter_records_as_csv())
+
+        assert len(chunks) == 3
+        assert chunks[1].count('\n') == EXPORT_BATCH_SIZE
+        assert chunks[2].count('\n') == 1
+
+    def test_export_csv_round_trip(self, test_db, sample_record):
+        """Test that exported values with commas and quotes import back unchanged"""
+        sample_record['notes'] = 'Keep dry, "do not freeze"'
+        test_db.add_record(sample_record)
+
+        csv_data = test_db.export_to_csv()
+        test_db.delete_record(test_db.get_all_records()[0]['id'])
+        results = test_db.import_from_csv(csv_data)
+
+        assert results['success'] == 1
+        assert test_db.get_all_records()[0]['notes'] == 'Keep dry, "do not freeze"'
+
 
 class TestFridgeConfig:
     """Tests for fridge configuration operations"""
@@ -279,6 +420,11 @@ class TestFridgeConfig:
         assert config['door_columns'] == 3
 
 
+    def test_get_unknown_fridge_config(self, test_db):
+        """Test that an unknown temperature has no configuration"""
+        assert test_db.get_fridge_config('37C') is None
+
+
 class TestStorageLocation:
     """Tests for storage location operations"""
 
@@ -324,3 +470,323 @@ class TestStorageLocation:
         assert grid_data['body-1-1'] == 2  # Two drugs at this location
         assert 'body-2-1' in grid_data
         assert grid_data['body-2-1'] == 1
+
+
+    def test_location_lookup_uses_index(self, test_db):
+        """Test that location queries seek on the location index"""
+        with test_db.read_connection() as conn:
+            plan = conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM drugs WHERE storage_temp = ? AND storage_section = ? '
+                'AND storage_row = ? AND storage_column = ?', ('4C', 'body', 0, 0)
+            ).fetchall()
+        assert any('idx_drugs_location' in step['detail'] for step in plan)
+
+
+    def test_region_lookup_uses_index(self, test_db):
+        """Test that region item queries seek on the region index"""
+        with test_db.read_connection() as conn:
+            plan = conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM drugs WHERE fridge_region_id = ?', (1,)
+            ).fetchall()
+        assert any('idx_drugs_fridge_region' in step['detail'] for step in plan)
+
+
+class TestConnectionPool:
+    """Tests for pooled connection handling"""
+
+    def test_wal_journal_mode(self, test_db):
+        """Test that connections use write-ahead logging"""
+        with test_db.read_connection() as conn:
+            mode = conn.execute('PRAGMA journal_mode').fetchone()['journal_mode']
+        assert mode == 'wal'
+
+    def test_read_connection_reused(self, test_db):
+        """Test that read connections are returned to the pool"""
+        with test_db.read_connection() as conn:
+            first = conn
+        with test_db.read_connection() as conn:
+            assert conn is first
+
+    def test_write_rolled_back_on_error(self, test_db):
+        """Test that a failed write leaves no partial changes"""
+        with pytest.raises(RuntimeError):
+            with test_db.write_connection() as conn:
+                conn.execute("INSERT INTO drugs (drug_name) VALUES ('Partial')")
+                raise RuntimeError('boom')
+
+        assert len(test_db.get_all_records()) == 0
+
+    def test_reset_after_fork(self, test_db, sample_record):
+        """Test that a forked child opens fresh connections"""
+        with test_db.read_connection() as conn:
+            inherited_reader = conn
+        inherited_writer = test_db._write_conn
+
+        test_db.reset_after_fork()
+
+        with test_db.read_connection() as conn:
+            assert conn is not inherited_reader
+        test_db.add_record(sample_record)
+        assert test_db._write_conn is not inherited_writer
+        assert len(test_db.get_all_records()) == 1
+
+    def test_read_connection_is_read_only(self, test_db):
+        """Test that pooled read connections refuse writes"""
+        import sqlite3
+        with test_db.read_connection() as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO drugs (drug_name) VALUES ('Sneaky')")
+
+    def test_reader_sees_committed_writes(self, test_db, sample_record):
+        """Test that an already-open read connection sees later commits"""
+        with test_db.read_connection():
+            pass
+        test_db.add_record(sample_record)
+
+        assert len(test_db.get_all_records()) == 1
+
+
+    def test_schema_version_skips_migrations(self, test_db, monkeypatch):
+        """Test that reopening an up-to-date database skips the schema checks"""
+        from database import Database, SCHEMA_VERSION
+        with test_db.read_connection() as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()['user_version'] == SCHEMA_VERSION
+
+        def fail(self, cursor):
+            raise AssertionError('schema rebuilt')
+        monkeypatch.setattr(Database, '_create_schema', fail)
+
+        reopened = Database(test_db.db_path)
+        assert reopened._search_index == test_db._search_index
+        reopened.close()
+
+
+class TestSettings:
+    """Tests for settings storage and caching"""
+
+    def test_default_settings(self, test_db):
+        """Test that default settings are created"""
+        settings = test_db.get_all_settings()
+        assert settings['lab_name'] == ''
+        assert settings['pi_name'] == ''
+
+    def test_set_setting_invalidates_cache(self, test_db):
+        """Test that cached settings reflect a new value immediately"""
+        test_db.get_all_settings()  # Populate the cache
+        test_db.set_setting('lab_name', 'Smith')
+
+        assert test_db.get_all_settings()['lab_name'] == 'Smith'
+
+    def test_set_settings(self, test_db):
+        """Test setting several values at once"""
+        test_db.get_all_settings()
+        test_db.set_settings({'lab_name': 'Bulk Lab', 'pi_name': 'Dr. Bulk'})
+
+        settings = test_db.get_all_settings()
+        assert settings['lab_name'] == 'Bulk Lab'
+        assert settings['pi_name'] == 'Dr. Bulk'
+
+    def test_get_setting_uses_cache(self, test_db):
+        """Test single-key lookups see new values and unknown keys"""
+        assert test_db.get_setting('lab_name') == ''
+        test_db.set_setting('lab_name', 'Smith')
+
+        assert test_db.get_setting('lab_name') == 'Smith'
+        assert test_db.get_setting('missing') is None
+
+    def test_read_overlapping_write_is_not_cached(self, test_db):
+        """Test that a load which started before an invalidation is returned but not kept"""
+        def load_then_write():
+            settings = test_db._load_settings()
+            test_db.set_setting('lab_name', 'Smith')  # Write lands while the read is in flight
+            return settings
+
+        assert test_db._cached('settings', load_then_write)['lab_name'] == ''
+        assert test_db.get_all_settings()['lab_name'] == 'Smith'
+
+    def test_group_read_overlapping_write_is_not_cached(self, test_db):
+        """Test that group invalidation also discards in-flight loads of keys in the group"""
+        primary_id = test_db.add_primary_antibody({'name': 'Anti-GFP', 'host_species': 'Rabbit'})
+
+        def load_then_write():
+            matches = test_db._find_matching_secondaries(primary_id)
+            test_db.add_secondary_antibody({'name': 'Goat anti-Rabbit', 'target_species': 'Rabbit'})
+            return matches
+
+        assert test_db._cached(('antibody_matches', primary_id), load_then_write) == []
+        assert len(test_db.find_matching_secondaries(primary_id)) == 1
+
+
+class TestLayoutBundle:
+    """Tests for combined layout/region/occupancy lookups"""
+
+    def test_get_layout_bundle(self, test_db, sample_record):
+        """Test that regions and their item counts are returned together"""
+        layout_id = test_db.create_or_update_layout('4C', 'body', 'photo.jpg')
+        region_a = test_db.create_region(layout_id, 'A', 0, 0, 10, 10)
+        test_db.create_region(layout_id, 'B', 10, 0, 10, 10)
+
+        record_id = test_db.add_record(sample_record)
+        test_db.assign_item_to_region(record_id, region_a)
+
+        layout, regions, occupancy = test_db.get_layout_bundle('4C', 'body')
+
+        assert layout['photo_filename'] == 'photo.jpg'
+        assert [r['region_name'] for r in regions] == ['A', 'B']
+        assert [o['item_count'] for o in occupancy] == [1, 0]
+
+    def test_update_layout_returns_existing_id(self, test_db, sample_record):
+        """Test that re-uploading a layout photo returns the existing layout id"""
+        layout_id = test_db.create_or_update_layout('4C', 'body', 'photo.jpg')
+        # Leave a different last-inserted rowid on the writer connection
+        test_db.add_record(sample_record)
+        test_db.add_record(sample_record)
+
+        assert test_db.create_or_update_layout('4C', 'body', 'newer.jpg') == layout_id
+        assert test_db.get_layout('4C', 'body')['photo_filename'] == 'newer.jpg'
+
+    def test_region_occupancy_uses_indexes(self, test_db):
+        """Test that region occupancy seeks regions by layout and counts from the region index"""
+        with test_db.read_connection() as conn:
+            plan = [step['detail'] for step in conn.execute('''
+                EXPLAIN QUERY PLAN
+                SELECT fr.id, COUNT(d.id) FROM fridge_regions fr
+                LEFT JOIN drugs d ON d.fridge_region_id = fr.id
+                WHERE fr.layout_id = ? GROUP BY fr.id
+            ''', (1,))]
+        assert any('idx_fridge_regions_layout' in step for step in plan)
+        assert any('COVERING INDEX idx_drugs_fridge_region' in step for step in plan)
+
+    def test_get_layout_bundle_missing(self, test_db):
+        """Test that a missing layout returns None"""
+        assert test_db.get_layout_bundle('4C', 'door') is None
+
+
+class TestSchematicZones:
+    """Tests for schematic zone operations"""
+
+    def test_replace_schematic_zones(self, test_db):
+        """Test that replacing zones drops the old ones"""
+        layout_id = test_db.create_schematic_layout('4C', 'body', fridge_id=1)
+        test_db.add_schematic_zone(layout_id, 'Old', 0, 0)
+
+        test_db.replace_schematic_zones(layout_id, [
+            {'zone_name': 'A', 'row_index': 0, 'col_index': 0},
+            {'zone_name': 'B', 'row_index': 0, 'col_index': 1, 'color': '#ffffff'}
+        ])
+
+        zones = test_db.get_schematic_zones(layout_id)
+        assert [z['zone_name'] for z in zones] == ['A', 'B']
+        assert zones[0]['color'] == '#e3f2fd'
+        assert zones[1]['color'] == '#ffffff'
+
+
+class TestAntibodies:
+    """Tests for primary and secondary antibody storage"""
+
+    def test_primary_antibody_round_trip(self, test_db):
+        """Test adding and updating a primary antibody, with is_conjugated stored as 0/1"""
+        ab_id = test_db.add_primary_antibody({'name': 'Anti-GFP', 'is_conjugated': True, 'fluorophore': 'FITC'})
+        antibody = test_db.get_primary_antibody_by_id(ab_id)
+        assert antibody['is_conjugated'] == 1
+        assert antibody['fluorophore'] == 'FITC'
+
+        test_db.update_primary_antibody(ab_id, {'name': 'Anti-RFP', 'isotype': 'IgG1'})
+        antibody = test_db.get_primary_antibody_by_id(ab_id)
+        assert antibody['name'] == 'Anti-RFP'
+        assert antibody['isotype'] == 'IgG1'
+        assert antibody['is_conjugated'] == 0
+        assert antibody['fluorophore'] is None
+
+    def test_secondary_antibody_round_trip(self, test_db):
+        """Test adding and updating a secondary antibody"""
+        ab_id = test_db.add_secondary_antibody({'name': 'Goat anti-Mouse', 'target_species': 'Mouse'})
+        test_db.update_secondary_antibody(ab_id, {'name': 'Goat anti-Mouse IgG', 'target_species': 'Mouse',
+                                                   'cross_adsorbed': 'Yes'})
+
+        antibody = test_db.get_secondary_antibody_by_id(ab_id)
+        assert antibody['name'] == 'Goat anti-Mouse IgG'
+        assert antibody['cross_adsorbed'] == 'Yes'
+
+    def test_antibody_lists_leave_out_detail_columns(self, test_db):
+        """Test that list views skip long text columns kept for the detail view"""
+        test_db.add_primary_antibody({'name': 'Anti-GFP', 'host_species': 'Rabbit', 'notes': 'Long notes'})
+        test_db.add_secondary_antibody({'name': 'Goat anti-Rabbit', 'cross_adsorbed_against': 'Mouse'})
+
+        primary = test_db.get_all_primary_antibodies()[0]
+        secondary = test_db.get_all_secondary_antibodies()[0]
+        assert primary['host_species'] == 'Rabbit'
+        assert 'notes' not in primary
+        assert 'cross_adsorbed_against' not in secondary
+        assert test_db.get_primary_antibody_by_id(primary['id'])['notes'] == 'Long notes'
+
+
+class TestAntibodyMatching:
+    """Tests for primary/secondary antibody matching"""
+
+    def test_matches_refresh_after_secondary_added(self, test_db):
+        """Test that cached matches are dropped when antibodies change"""
+        primary_id = test_db.add_primary_antibody({'name': 'Anti-GFP', 'host_species': 'Rabbit'})
+        assert test_db.find_matching_secondaries(primary_id) == []
+
+        secondary_id = test_db.add_secondary_antibody({'name': 'Goat anti-Rabbit', 'target_species': 'rabbit'})
+        matches = test_db.find_matching_secondaries(primary_id)
+        assert [m['antibody']['id'] for m in matches] == [secondary_id]
+
+        test_db.delete_secondary_antibody(secondary_id)
+        assert test_db.find_matching_secondaries(primary_id) == []
+
+    def test_match_scores(self, test_db):
+        """Test isotype, H+L and cross-adsorbed scoring"""
+        primary_id = test_db.add_primary_antibody({'name': 'Anti-Actin', 'host_species': 'Mouse',
+                                                   'isotype': 'IgG1', 'clonality': 'Monoclonal'})
+        test_db.add_secondary_antibody({'name': 'Isotype', 'target_species': 'Mouse', 'target_isotype': 'IgG1'})
+        test_db.add_secondary_antibody({'name': 'Broad', 'target_species': 'Mouse', 'target_isotype': 'IgG (H&L)',
+                                        'cross_adsorbed': 'Yes'})
+        test_db.add_secondary_antibody({'name': 'Other', 'target_species': 'Mouse', 'target_isotype': 'IgM'})
+
+        matches = test_db.find_matching_secondaries(primary_id)
+        assert [(m['antibody']['name'], m['score']) for m in matches] == [
+            ('Isotype', 3), ('Broad', 3), ('Other', 0)
+        ]
+
+    def test_secondary_lookup_uses_species_index(self, test_db):
+        """Test that secondaries are found by target species through the expression index"""
+        with test_db.read_connection() as conn:
+            plan = conn.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM secondary_antibodies WHERE LOWER(target_species) = LOWER(?)',
+                ('Mouse',)
+            ).fetchall()
+        assert any('idx_secondary_antibodies_target_species' in step['detail'] for step in plan)
+
+
+class TestMigration:
+    """Tests for the legacy schema migration script"""
+
+    def test_migration_keeps_indexes_and_search(self, tmp_path, monkeypatch, sample_record):
+        """Test that indexes, search triggers and the search index survive the table swap"""
+        import os
+        import runpy
+        from database import Database
+
+        schema_query = "SELECT name FROM sqlite_master WHERE tbl_name = 'drugs' AND type IN ('index', 'trigger')"
+        db = Database(str(tmp_path / 'lab_management.db'))
+        db.add_record(sample_record)
+        with db.read_connection() as conn:
+            expected = {row['name'] for row in conn.execute(schema_query)}
+        db.close()
+
+        monkeypatch.chdir(tmp_path)
+        runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrate_database.py'))
+
+        db = Database(str(tmp_path / 'lab_management.db'))
+        try:
+            with db.read_connection() as conn:
+                assert {row['name'] for row in conn.execute(schema_query)} == expected
+            assert [r['drug_name'] for r in db.search_records('Test Drug')] == ['Test Drug']
+
+            sample_record['drug_name'] = 'Added After Migration'
+            db.add_record(sample_record)
+            assert [r['drug_name'] for r in db.search_records('After Migration')] == ['Added After Migration']
+        finally:
+            db.close()
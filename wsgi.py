@@ -0,0 +1,17 @@
+"""
+WSGI entrypoint for Lab Management System
+Used by production servers instead of the Flask development server
+
+Run with gevent workers (Linux/macOS):
+    gunicorn -k gevent -w 4 --worker-connections 1000 --no-preload wsgi:app
+
+The gevent worker monkey-patches the standard library itself, so app.py
+does not need to import gevent - but only when each worker imports the app.
+Preloading must stay off for gevent (gunicorn.conf.py turns it off when
+LAB_WORKER_CLASS=gevent); a preloaded app builds its locks unpatched.
+"""
+
+from app import app
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)